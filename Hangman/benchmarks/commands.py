@@ -0,0 +1,113 @@
+"""
+Per-command latency of the pandas and plain-tuple versions of /history and /leaderboard.
+
+Both versions run the same query against a seeded database and render the same table, so the difference is the cost
+of building and reshaping DataFrames. The one-off cost of importing pandas is reported separately. The bot no longer
+depends on pandas, install it with ``pip install -r benchmarks/requirements.txt``. Run from the ``Hangman`` directory
+with ``python -m benchmarks.commands``.
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from tabulate import tabulate
+from hangman import GameRecord
+
+HISTORY_QUERY = "SELECT word, is_done, lives, points FROM games WHERE player_id = ? ORDER BY created_at DESC LIMIT ?"
+LEADERBOARD_QUERY = ("SELECT p.discord_id, SUM(d.points) as total_points, p.credits FROM guild_members m "
+                     "JOIN players p ON p.id = m.user_id LEFT JOIN player_daily_points d ON d.player_id = p.id "
+                     "WHERE m.guild_id = ? GROUP BY p.discord_id ORDER BY total_points DESC LIMIT ?")
+
+
+def seed(conn: sqlite3.Connection, n_players: int, n_games: int) -> None:
+    conn.execute("CREATE TABLE players (id INTEGER PRIMARY KEY, discord_id INTEGER, points INTEGER, credits INTEGER)")
+    conn.execute("CREATE TABLE games (id INTEGER PRIMARY KEY, player_id INTEGER, word TEXT, is_done INTEGER, "
+                 "lives INTEGER, points INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE INDEX idx_games_player_created ON games (player_id, created_at, points)")
+    conn.execute("CREATE TABLE guild_members (guild_id INTEGER, user_id INTEGER, PRIMARY KEY (guild_id, user_id))")
+    conn.execute("CREATE TABLE player_daily_points (player_id INTEGER, day TEXT, points INTEGER, "
+                 "PRIMARY KEY (player_id, day)) WITHOUT ROWID")
+    conn.executemany("INSERT INTO players VALUES (?, ?, 0, 500)", ((i, 1_000 + i) for i in range(1, n_players + 1)))
+    conn.executemany("INSERT INTO guild_members VALUES (1, ?)", ((i,) for i in range(1, n_players + 1)))
+    conn.executemany("INSERT INTO games (player_id, word, is_done, lives, points) VALUES (?, 'WORD', 1, ?, ?)",
+                     ((random.randint(1, n_players), random.randint(0, 5), random.randint(-50, 500))
+                      for _ in range(n_games)))
+    conn.execute("INSERT INTO player_daily_points SELECT player_id, date(created_at), SUM(points) FROM games "
+                 "GROUP BY player_id, date(created_at)")
+
+
+def history_pandas(conn: sqlite3.Connection, n: int) -> str:
+    import pandas as pd
+    games = conn.execute(HISTORY_QUERY, (1, n)).fetchall()
+    df = pd.DataFrame(columns=["Word", "Result", "Points"])
+    for i, (word, is_done, lives, points) in enumerate(games):
+        df.loc[i] = (word.title(), "Win" if is_done and lives > 0 else "Loss", points)
+    sum(val == "Win" for val in df.loc[:, "Result"]), df["Points"].sum()
+    return tabulate(df, headers="keys", showindex=False, tablefmt="presto")
+
+
+def history_tuples(conn: sqlite3.Connection, n: int) -> str:
+    records = [GameRecord(word.title(), "Win" if is_done and lives > 0 else "Loss", points)
+               for word, is_done, lives, points in conn.execute(HISTORY_QUERY, (1, n))]
+    sum(record.Result == "Win" for record in records), sum(record.Points for record in records)
+    return tabulate(records, headers=GameRecord._fields, showindex=False, tablefmt="presto")
+
+
+def leaderboard_pandas(conn: sqlite3.Connection, n: int) -> str:
+    import pandas as pd
+    data = pd.read_sql(LEADERBOARD_QUERY, con=conn, params=[1, n])
+    data.index = pd.Index(name="Place", data=list(range(1, len(data) + 1)), dtype=int)
+    data = data.rename(columns={"total_points": "Points", "credits": "Credits"}).dropna()
+    data["Player"] = [f"player{id_}" for id_ in data["discord_id"]]
+    data = data[["Player", "Points", "Credits", "discord_id"]]
+    data["Points"] = data["Points"].apply(lambda p: format(p, f",.{'0' if int(p) == float(p) else '1'}f"))
+    data["Credits"] = data["Credits"].apply(lambda p: format(p, ",d"))
+    return tabulate(data.drop(columns=["discord_id"]), headers="keys", tablefmt="simple_outline", showindex=True)
+
+
+def leaderboard_tuples(conn: sqlite3.Connection, n: int) -> str:
+    rows = [(place, f"player{discord_id}", format(points, f",.{'0' if int(points) == float(points) else '1'}f"),
+             format(credits, ",d"))
+            for place, (discord_id, points, credits) in enumerate(
+                (row for row in conn.execute(LEADERBOARD_QUERY, (1, n)) if row[1] is not None), start=1)]
+    return tabulate(rows, headers=["Place", "Player", "Points", "Credits"], tablefmt="simple_outline")
+
+
+def timed(function, conn: sqlite3.Connection, n: int, repeat: int) -> float:
+    function(conn, n)  # warm up, including the first pandas import
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(conn, n)
+    return (time.perf_counter() - start) / repeat
+
+
+def pandas_import_seconds() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import pandas"], check=True)
+    pandas_time = time.perf_counter() - start
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return pandas_time - (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[5, 10, 50], help="result sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        seed(conn, n_players=200, n_games=20_000)
+        print(f"{'command':<14}{'rows':>6}{'pandas':>12}{'tuples':>12}{'speedup':>10}")
+        for name, before, after in [("/history", history_pandas, history_tuples),
+                                    ("/leaderboard", leaderboard_pandas, leaderboard_tuples)]:
+            for n in args.rows:
+                old, new = timed(before, conn, n, args.repeat), timed(after, conn, n, args.repeat)
+                print(f"{name:<14}{n:>6}{old * 1e3:>10.2f}ms{new * 1e3:>10.2f}ms{old / new:>9.1f}x")
+        conn.close()
+    print(f"\nimporting pandas: {pandas_import_seconds() * 1e3:.0f} ms")
@@ -0,0 +1,60 @@
+"""
+Connection overhead micro-benchmark.
+
+Compares the old pattern of opening a fresh ``sqlite3`` connection for every statement with the persistent, WAL-mode
+connections managed by ``query``. Run from the ``Hangman`` directory with ``python -m benchmarks.connections``.
+"""
+import os
+import time
+import query
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+
+def seed(n_players: int) -> None:
+    with sqlite3.connect(query.DB_PATH) as conn:
+        conn.executemany("INSERT INTO players (discord_id) VALUES (?)", ((i,) for i in range(n_players)))
+
+
+def fresh_connection_per_statement(n: int, n_players: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        with sqlite3.connect(query.DB_PATH) as conn:
+            conn.execute("SELECT id, points, credits FROM players WHERE discord_id = ?",
+                         (random.randrange(n_players),)).fetchone()
+        conn.close()
+    return time.perf_counter() - start
+
+
+async def persistent_connections(n: int, n_players: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        await query.execute("SELECT id, points, credits FROM players WHERE discord_id = ?",
+                            (random.randrange(n_players),))
+    return time.perf_counter() - start
+
+
+async def main(n: int, n_players: int) -> None:
+    await query.initialize_db(include_backup=False)
+    seed(n_players)
+
+    before = fresh_connection_per_statement(n, n_players)
+    after = await persistent_connections(n, n_players)
+    print(f"{'fresh connection per statement':<32}{before / n * 1e6:>10.1f} us/query")
+    print(f"{'persistent connections':<32}{after / n * 1e6:>10.1f} us/query")
+    print(f"{'speedup':<32}{before / after:>10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=5_000, help="number of queries per run")
+    parser.add_argument("--players", type=int, default=10_000, help="number of seeded players")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        query.DB_PATH = os.path.join(tmp, "hangman.db")
+        asyncio.run(main(args.n, args.players))
+        query.close()
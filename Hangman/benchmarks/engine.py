@@ -0,0 +1,69 @@
+"""
+Guess throughput benchmark for the game engine.
+
+Plays random games letter by letter with the original list-based state (list membership checks, the progress string
+rebuilt on every guess and the remaining letters rescanned) and with `HangmanEngine`, and reports guesses per second.
+Run from the ``Hangman`` directory with ``python -m benchmarks.engine``.
+"""
+import time
+import random
+import string
+import options
+import argparse
+from engine import HangmanEngine
+
+WORDS = ["PNEUMONOULTRAMICROSCOPIC", "SERENDIPITY", "RHYTHM", "QUIZZICAL", "JUXTAPOSITION", "ONOMATOPOEIA",
+         "ICE CREAM", "MOTHER-IN-LAW", "CRYPT", "EXTRAORDINARY"]
+
+
+def list_based_game(word: str, guesses: str) -> int:
+    guessed_letters, wrong_letters, n = [], [], 0
+    for guess in guesses:
+        if guess in guessed_letters:
+            continue
+        n += 1
+        guessed_letters.append(guess)
+        if guess not in word:
+            wrong_letters.append(guess)
+        progress = " ".join(["\n" if letter == " " else options.MISSING_LETTER_EMOJI
+                             if letter not in guessed_letters and letter in string.ascii_uppercase
+                             else letter for letter in word])
+        num_vowels = sum(vowel in word for vowel in options.VOWELS)
+        num_vowels -= sum(letter in options.VOWELS for letter in guessed_letters)
+        sum(c in options.CONSONANTS for c in set(word) if c not in progress)
+        if progress.count(options.MISSING_LETTER_EMOJI) == 0:
+            break
+    return n
+
+
+def engine_game(word: str, guesses: str) -> int:
+    engine, n = HangmanEngine(word), 0
+    for guess in guesses:
+        if engine.is_guessed(guess):
+            continue
+        n += 1
+        engine.guess(guess)
+        engine.vowels_left, engine.consonants_left
+        if engine.is_solved():
+            break
+    return n
+
+
+def run(play, games: list[tuple[str, str]]) -> float:
+    start = time.perf_counter()
+    guesses = sum(play(word, order) for word, order in games)
+    return guesses / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=20_000, help="number of games to play")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    games = [(rng.choice(WORDS), "".join(rng.sample(string.ascii_uppercase, 26))) for _ in range(args.n)]
+    before = run(list_based_game, games)
+    after = run(engine_game, games)
+    print(f"{'list-based state':<20}{before:>14,.0f} guesses/s")
+    print(f"{'HangmanEngine':<20}{after:>14,.0f} guesses/s")
+    print(f"{'speedup':<20}{after / before:>14.1f}x")
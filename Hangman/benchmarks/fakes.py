@@ -0,0 +1,205 @@
+"""
+Stand-ins for the parts of discord.py the bot touches, so commands, buttons and modals can be driven without a
+gateway connection or network access. Every response, followup and fetch awaits `FakeClient.http_latency` in place
+of the Discord HTTP round trip.
+"""
+import json
+import time
+import asyncio
+import itertools
+
+_ids = itertools.count(10 ** 17)
+
+
+class FakeGuild:
+    def __init__(self, id_: int | None = None, name: str = "Guild"):
+        self.id = next(_ids) if id_ is None else id_
+        self.name = name
+        self.members: dict[int, "FakeUser"] = {}
+        self.channels: list["FakeChannel"] = []
+        self.shard_id = 0
+
+    def get_member(self, user_id: int) -> "FakeUser":
+        # every user the database knows about is treated as a member
+        member = self.members.get(user_id)
+        if member is None:
+            member = self.members[user_id] = FakeUser(user_id, guilds=[self])
+        return member
+
+    def get_channel(self, channel_id: int) -> "FakeChannel | None":
+        return next((channel for channel in self.channels if channel.id == channel_id), None)
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeUser:
+    def __init__(self, id_: int | None = None, name: str | None = None, guilds: list[FakeGuild] = ()):
+        self.id = next(_ids) if id_ is None else id_
+        self.name = name or f"player{self.id}"
+        self.nick = None
+        self.mention = f"<@{self.id}>"
+        self.mutual_guilds = list(guilds)
+        self.avatar = FakeAsset(f"https://cdn.discordapp.com/avatars/{self.id}/avatar.png")
+
+    # like discord.py's models, users are equal when their ids are
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return self.id >> 22
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeChannel:
+    def __init__(self, guild: FakeGuild, id_: int | None = None, name: str = "hangman"):
+        self.id = next(_ids) if id_ is None else id_
+        self.guild = guild
+        self.name = name
+        self.jump_url = f"https://discord.com/channels/{guild.id}/{self.id}"
+        guild.channels.append(self)
+
+
+class FakeClient:
+    """
+    Stands in for the bot where commands use it directly: channel lookups, the bot's own user and owner checks.
+    """
+
+    def __init__(self, guilds: list[FakeGuild] = (), http_latency: float = 0.0, owner_id: int | None = None):
+        self.guilds = list(guilds)
+        self.http_latency = http_latency
+        self.owner_id = owner_id
+        self.user = FakeUser(name="Hangman")
+        self.latency = http_latency
+        self.shard_count = 1
+        self.http_requests = 0
+
+    async def http(self) -> None:
+        self.http_requests += 1
+        if self.http_latency > 0:
+            await asyncio.sleep(self.http_latency)
+
+    def get_channel(self, channel_id: int) -> FakeChannel | None:
+        for guild in self.guilds:
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        return None
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        await self.http()
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            raise LookupError(f"Unknown channel {channel_id}")
+        return channel
+
+    async def is_owner(self, user: FakeUser) -> bool:
+        return user.id == self.owner_id
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, kind: str, kwargs: dict) -> None:
+        if self._done:
+            raise RuntimeError("This interaction has already been responded to before")
+        self._done = True
+        self.interaction.responded_at = time.perf_counter()
+        await self.interaction.client.http()
+        self.interaction.sent.append((kind, kwargs))
+
+    async def defer(self, **kwargs) -> None:
+        await self._respond("defer", kwargs)
+
+    async def send_message(self, content: str | None = None, **kwargs) -> None:
+        await self._respond("send_message", {"content": content, **kwargs})
+
+    async def edit_message(self, **kwargs) -> None:
+        await self._respond("edit_message", kwargs)
+
+    async def send_modal(self, modal) -> None:
+        await self._respond("send_modal", {"modal": modal})
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content: str | None = None, **kwargs) -> None:
+        if not self.interaction.response.is_done():
+            raise RuntimeError("The interaction must be responded to before sending a followup")
+        await self.interaction.client.http()
+        self.interaction.sent.append(("followup", {"content": content, **kwargs}))
+
+
+_default_client = FakeClient()
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser, channel: FakeChannel, client: FakeClient | None = None):
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.client = client or _default_client
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.sent: list[tuple[str, dict]] = []  # (kind, keyword arguments) of every response and followup
+        self.created_at = time.perf_counter()
+        self.responded_at: float | None = None  # Discord fails interactions not responded to within 3 seconds
+
+    def last(self, key: str):
+        """
+        :return: The latest value of the `key` keyword argument among the responses and followups, or None
+        """
+        return next((kwargs[key] for _, kwargs in reversed(self.sent) if key in kwargs), None)
+
+
+async def submit_modal(modal, interaction: FakeInteraction, *values: str) -> None:
+    """
+    Fills in the text inputs of `modal` in order, the way discord.py does when the user submits it, and submits it.
+    """
+    from discord.ui import TextInput
+
+    inputs = [item for item in modal.children if isinstance(item, TextInput)]
+    for item, value in zip(inputs, values):
+        item._refresh_state(interaction, {"value": value})
+    await modal.on_submit(interaction)
+
+
+class FakeWordnik:
+    """
+    Serves words from a fixed list in place of Wordnik. Set `wotd` to change the word of the day, `down` to make every
+    call fail and `delay` to make every call take that many seconds.
+    """
+
+    def __init__(self, words: list[str], wotd: str = "rhythm"):
+        self.words = itertools.cycle(words)
+        self.wotd = wotd
+        self.down = False
+        self.delay = 0.0
+        self.wotd_calls = 0
+
+    def _call(self) -> None:
+        if self.delay > 0:
+            time.sleep(self.delay)  # like Wordnik's blocking requests, this runs on a worker thread
+        if self.down:
+            raise ConnectionError("Wordnik is down")
+
+    def get_random_word(self) -> str:
+        self._call()
+        return next(self.words)
+
+    def word_of_the_day(self) -> str:
+        self.wotd_calls += 1
+        self._call()
+        return json.dumps({"word": self.wotd,
+                           "definitions": [{"partOfSpeech": "noun", "text": f"The word {self.wotd}."}]})
@@ -0,0 +1,274 @@
+"""
+Load harness that replays a trace of interactions against the real command, button and modal handlers, through the
+fakes in `benchmarks.fakes`, and reports latency and throughput. Nothing touches the network: Wordnik is replaced by
+a word list and every Discord HTTP call by a sleep of ``--http-latency`` seconds.
+
+A trace is a JSON lines file with one interaction per line::
+
+    {"at": 0.42, "user": 1000000000000001, "guild": 1, "channel": 3, "action": "guess_letter", "value": "E"}
+
+``at`` is the offset in seconds from the start of the trace. ``action`` is a slash command (``hangman``,
+``leaderboard``, ``history`` or ``profile``) or a button on the player's current game (``guess_letter``,
+``solve_puzzle``, ``buy_vowel``, ``buy_consonant`` or ``quit_game``). ``value`` is what the player types into the modal
+a button opens; without one, ``solve_puzzle`` guesses the right word. Without ``--trace`` a synthetic trace of
+``--events`` interactions is generated, and ``--record`` saves it for later runs.
+
+Interactions are started on schedule whether or not earlier ones have finished, so a slow bot queues work up the way
+it would in production, but one player's interactions run in order. Latency is measured from the scheduled start. Run
+from the ``Hangman`` directory with ``python -m benchmarks.replay``.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import throttle
+from collections import defaultdict
+
+from benchmarks.suite import WORDS, GUESS_ORDER
+from benchmarks.fakes import FakeGuild, FakeUser, FakeClient, FakeChannel, FakeWordnik, FakeInteraction, submit_modal
+
+COMMANDS = ("hangman", "leaderboard", "history", "profile")
+BUTTONS = ("guess_letter", "solve_puzzle", "buy_vowel", "buy_consonant", "quit_game")
+# Relative frequency of each action in synthetic traces, roughly what the bot sees
+MIX = {"hangman": 12, "guess_letter": 60, "solve_puzzle": 3, "buy_vowel": 5, "buy_consonant": 5, "quit_game": 1,
+       "leaderboard": 6, "history": 4, "profile": 4}
+ACK_DEADLINE = 3.0  # seconds Discord waits for the first response to an interaction
+
+
+def synthetic_trace(n_events: int, rate: float, n_players: int, n_guilds: int, seed: int) -> list[dict]:
+    """
+    Generates `n_events` interactions arriving at `rate` per second on average. Buttons are only pressed by players
+    who ran /hangman, and each player guesses letters in frequency order.
+    """
+    rng = random.Random(seed)
+    players = {10 ** 15 + i: rng.randint(1, n_guilds) for i in range(1, n_players + 1)}
+    playing: dict[int, int] = {}  # user -> index of the next letter in GUESS_ORDER
+    actions, weights = zip(*MIX.items())
+    trace, at = [], 0.0
+    while len(trace) < n_events:
+        at += rng.expovariate(rate)
+        action = rng.choices(actions, weights)[0]
+        if action in BUTTONS and not playing:
+            action = "hangman"
+        user = rng.choice(list(playing)) if action in BUTTONS else rng.choice(list(players))
+        guild = players[user]
+        channel = guild * 3 + (user % 3 if rng.random() < 0.95 else rng.randrange(3))  # usually the same channel
+        event = {"at": round(at, 6), "user": user, "guild": guild, "channel": channel, "action": action}
+        if action == "hangman":
+            playing.setdefault(user, 0)
+        elif action == "guess_letter":
+            event["value"] = GUESS_ORDER[playing[user]]
+            playing[user] += 1
+        elif action == "solve_puzzle" and rng.random() < 0.5:
+            event["value"] = "?"  # a wrong guess, padded to the word's length on replay
+        if action in ("solve_puzzle", "quit_game") or playing.get(user) == len(GUESS_ORDER):
+            playing.pop(user, None)
+        trace.append(event)
+    return trace
+
+
+def load_trace(path: str) -> list[dict]:
+    with open(path) as file:
+        return sorted((json.loads(line) for line in file if line.strip()), key=lambda event: event["at"])
+
+
+def save_trace(trace: list[dict], path: str) -> None:
+    with open(path, "w") as file:
+        file.writelines(json.dumps(event) + "\n" for event in trace)
+
+
+class Replay:
+    def __init__(self, client: FakeClient):
+        self.client = client
+        self.guilds: dict[int, FakeGuild] = {}
+        self.channels: dict[int, FakeChannel] = {}
+        self.users: dict[int, FakeUser] = {}
+        self.views: dict[int, object] = {}  # user -> the view of their current game
+        self.locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.skipped: dict[str, int] = defaultdict(int)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.late_acks = 0
+        self.in_flight = self.max_in_flight = 0
+
+    def _context(self, event: dict) -> tuple[FakeUser, FakeChannel]:
+        guild = self.guilds.get(event["guild"])
+        if guild is None:
+            guild = self.guilds[event["guild"]] = FakeGuild(event["guild"])
+            self.client.guilds.append(guild)
+        channel = self.channels.get(event["channel"])
+        if channel is None:
+            channel = self.channels[event["channel"]] = FakeChannel(guild, event["channel"])
+        user = self.users.get(event["user"])
+        if user is None:
+            user = self.users[event["user"]] = FakeUser(event["user"])
+        if guild not in user.mutual_guilds:
+            user.mutual_guilds.append(guild)
+            guild.members[user.id] = user
+        return user, channel
+
+    async def perform(self, event: dict) -> bool:
+        """
+        Runs one interaction of the trace.
+
+        :return: False if it was skipped because the player has no game with that button enabled
+        """
+        import main
+
+        user, channel = self._context(event)
+        interaction = FakeInteraction(user, channel, self.client)
+        action = event["action"]
+
+        if action in COMMANDS:
+            await getattr(main, action).callback(interaction)
+            view = interaction.last("view")
+            if view is not None:  # not when the player's game is in another channel
+                self.views[user.id] = view
+            self._check_ack(interaction)
+            return True
+
+        view = self.views.get(user.id)
+        button = getattr(view, action, None)
+        if view is None or view.game.is_done or button is None or button.disabled:
+            return False
+        await button.callback(interaction)
+        self._check_ack(interaction)
+        modal = interaction.last("modal")
+        if modal is not None:  # the player types their guess and submits it as a new interaction
+            interaction = FakeInteraction(user, channel, self.client)
+            value = event.get("value") or view.game.word
+            if action == "solve_puzzle":
+                value = value.ljust(len(view.game.word), "?")[:len(view.game.word)]
+            await submit_modal(modal, interaction, value)
+            self._check_ack(interaction)
+        if interaction.sent and interaction.sent[-1][1].get("view", view) is None:  # the game is over
+            self.views.pop(user.id, None)
+        return True
+
+    def _check_ack(self, interaction: FakeInteraction) -> None:
+        if interaction.responded_at is None or interaction.responded_at - interaction.created_at > ACK_DEADLINE:
+            self.late_acks += 1
+
+    async def run_event(self, event: dict, scheduled: float) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            async with self.locks[event["user"]]:
+                if not await self.perform(event):
+                    self.skipped[event["action"]] += 1
+                    return
+            self.latencies[event["action"]].append(time.perf_counter() - scheduled)
+        except Exception as e:
+            self.errors[f"{event['action']}: {type(e).__name__}: {e}"] += 1
+        finally:
+            self.in_flight -= 1
+
+    async def replay(self, trace: list[dict], speed: float) -> float:
+        """
+        Starts every interaction at its offset divided by `speed`.
+
+        :return: The seconds from the first interaction starting to the last one finishing
+        """
+        tasks = []
+        start = time.perf_counter()
+        for event in trace:
+            scheduled = start + event["at"] / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.run_event(event, scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def report(replay: Replay, elapsed: float, n_events: int, target_rate: float) -> None:
+    print(f"{'action':<16}{'count':>8}{'p50':>11}{'p99':>11}{'max':>11}{'skipped':>9}")
+    everything = []
+    for action in COMMANDS + BUTTONS:
+        seconds = sorted(replay.latencies.get(action, ()))
+        everything += seconds
+        if not seconds and not replay.skipped.get(action):
+            continue
+        if seconds:
+            print(f"{action:<16}{len(seconds):>8}{statistics.median(seconds) * 1e3:>9.1f}ms"
+                  f"{percentile(seconds, 0.99) * 1e3:>9.1f}ms{seconds[-1] * 1e3:>9.1f}ms{replay.skipped[action]:>9}")
+        else:
+            print(f"{action:<16}{0:>8}{'-':>11}{'-':>11}{'-':>11}{replay.skipped[action]:>9}")
+    everything.sort()
+    if everything:
+        print(f"{'all':<16}{len(everything):>8}{statistics.median(everything) * 1e3:>9.1f}ms"
+              f"{percentile(everything, 0.99) * 1e3:>9.1f}ms{everything[-1] * 1e3:>9.1f}ms"
+              f"{sum(replay.skipped.values()):>9}")
+
+    print(f"\n{len(everything):,} of {n_events:,} interactions in {elapsed:.2f}s: {len(everything) / elapsed:,.1f}/s "
+          f"(target {target_rate:,.1f}/s), at most {replay.max_in_flight} in flight")
+    print(f"{replay.client.http_requests:,} Discord HTTP calls, {replay.late_acks} responses later than "
+          f"{ACK_DEADLINE:.0f}s")
+    admission = throttle.admission.stats()
+    print(f"{admission['shed']:,} interactions shed by admission control, at most {admission['max_waiting']} "
+          f"waiting for a slot")
+    for error, count in sorted(replay.errors.items(), key=lambda item: -item[1]):
+        print(f"{count:>6} x {error}")
+
+
+async def run(args) -> Replay:
+    import main
+    import query
+    import words
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.events, args.rate, args.players, args.guilds, args.seed)
+    if args.record:
+        save_trace(trace, args.record)
+        print(f"Saved the trace to {args.record}")
+    duration = trace[-1]["at"] if trace else 0.0
+    speed = args.rate / (len(trace) / duration) if args.rate and duration else 1.0
+
+    query.DB_PATH = args.db or os.path.join(tempfile.mkdtemp(), "hangman.db")
+    words.WOTD_PATH = os.path.join(tempfile.mkdtemp(), "wotd.json")
+    words.provider = FakeWordnik(WORDS)
+    await query.initialize_db(include_backup=False)
+    await words.refresh_word_of_the_day()
+    words.pool.start()
+    await asyncio.sleep(0.1)  # let the word pool fill
+
+    client = FakeClient(http_latency=args.http_latency)
+    main.bot = client  # the handlers look the bot up as a module global
+    replay = Replay(client)
+    elapsed = await replay.replay(trace, speed)
+    await query.flush()
+    report(replay, elapsed, len(trace), len(trace) / duration * speed if duration else 0.0)
+    return replay
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trace", help="JSON lines trace to replay instead of a synthetic one")
+    parser.add_argument("--record", help="save the trace being replayed to this path")
+    parser.add_argument("--rate", type=float, default=100.0,
+                        help="interactions per second; a recorded trace is sped up or slowed down to match")
+    parser.add_argument("--events", type=int, default=5_000, help="interactions in a synthetic trace")
+    parser.add_argument("--players", type=int, default=2_000, help="players in a synthetic trace")
+    parser.add_argument("--guilds", type=int, default=50, help="guilds in a synthetic trace")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="seconds each Discord HTTP call takes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database to play against, e.g. a copy of the benchmark suite's; "
+                                     "a new empty one by default")
+    args = parser.parse_args()
+
+    import query
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        query.close()
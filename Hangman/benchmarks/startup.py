@@ -0,0 +1,65 @@
+"""
+Cold start budget check.
+
+Measures, in fresh interpreters, how long importing ``main`` takes and how long it takes to get from process start to
+a migrated, connected database (the local part of ``on_ready``). Fails if any run is over budget or if one of the
+lazily loaded dependencies gets imported at startup again. The time to the real ``on_ready``, including the gateway
+connection and command sync, is printed by the bot itself. Run from the ``Hangman`` directory with
+``python -m benchmarks.startup``; ``tests/test_startup.py`` enforces the same budgets.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+IMPORT_BUDGET = 1.0  # seconds allowed for `import main`
+READY_BUDGET = 1.5  # seconds allowed from process start until the database is ready
+# Only the code paths that need these import them
+LAZY_MODULES = ["pandas", "mysql.connector", "random_word", "tabulate"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+import query, asyncio
+query.DB_PATH = sys.argv[1]
+asyncio.run(query.initialize_db(include_backup=False))
+query.close()
+print(json.dumps({"import": imported, "ready": time.perf_counter() - start,
+                  "eager": [name for name in %r if name in sys.modules]}))
+""" % LAZY_MODULES
+
+
+def probe(db_path: str) -> dict:
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", PROBE, db_path], cwd=here, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="number of fresh interpreters to start")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="seconds allowed for `import main`")
+    parser.add_argument("--ready-budget", type=float, default=READY_BUDGET,
+                        help="seconds allowed until the database is ready")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [probe(os.path.join(tmp, f"hangman_{i}.db")) for i in range(args.n)]
+
+    imports, readies = [run["import"] for run in runs], [run["ready"] for run in runs]
+    eager = sorted({name for run in runs for name in run["eager"]})
+    print(f"import main     median {statistics.median(imports) * 1e3:7.1f} ms   max {max(imports) * 1e3:7.1f} ms   "
+          f"budget {args.import_budget * 1e3:.0f} ms")
+    print(f"database ready  median {statistics.median(readies) * 1e3:7.1f} ms   max {max(readies) * 1e3:7.1f} ms   "
+          f"budget {args.ready_budget * 1e3:.0f} ms")
+    if eager:
+        print("imported at startup but should be lazy:", ", ".join(eager))
+
+    over_budget = max(imports) > args.import_budget or max(readies) > args.ready_budget
+    sys.exit(1 if over_budget or eager else 0)
@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the game and the database query layer, with stored baselines.
+
+Builds (once, then reuses) a synthetic database with millions of games and tens of thousands of players spread across
+many guilds, then measures, through fake interactions and the real `Player`, `Hangman` and leaderboard code:
+
+- guesses per second through `Hangman.push_guess`, from new game to win or loss
+- `Player.load` with a cold and a warm player cache
+- `Player.record` and `Player.last_n_games`
+- the /leaderboard query and table for every period, with the leaderboard cache cleared
+
+``--save`` stores the results as the baseline; otherwise they are compared with the stored baseline and any benchmark
+whose median got slower than ``--tolerance`` allows is flagged, with a non-zero exit code. Benchmarks write to the database
+like the bot does, so the synthetic database slowly grows between runs; use ``--rebuild`` to start over. Run from the
+``Hangman`` directory with ``python -m benchmarks.suite``.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+WARMUP = 5  # untimed calls before each benchmark
+GUESS_ORDER = "ETAOINSHRDLUCMFWYPVBGKQJXZ"
+WORDS = ["PNEUMONOULTRAMICROSCOPIC", "SERENDIPITY", "RHYTHM", "QUIZZICAL", "JUXTAPOSITION", "ONOMATOPOEIA",
+         "ICE CREAM", "MOTHER-IN-LAW", "CRYPT", "EXTRAORDINARY"]
+
+
+def build_database(path: str, n_players: int, n_games: int, n_guilds: int) -> None:
+    import query
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("BEGIN")
+    query._create_tables(conn)
+    query._migrate(conn)
+    conn.executemany("INSERT INTO players (id, discord_id, points, credits) VALUES (?, ?, ?, ?)",
+                     ((i, 10 ** 15 + i, random.randint(0, 50_000), random.randint(0, 5_000))
+                      for i in range(1, n_players + 1)))
+    # every player is in one to five guilds
+    conn.executemany("INSERT OR IGNORE INTO guild_members (guild_id, user_id) VALUES (?, ?)",
+                     ((random.randint(1, n_guilds), i)
+                      for i in range(1, n_players + 1) for _ in range(random.randint(1, 5))))
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO games (player_id, channel_id, word, is_wotd, lives, progress, guessed_letters, guessed_words,
+                           wrong_letters, definitions, points, is_done, created_at)
+        SELECT abs(random()) % ? + 1, 1, 'WORD' || (abs(random()) % 5000), abs(random()) % 20 = 0,
+               abs(random()) % 7, '', '[]', '[]', '[]', '[]', abs(random()) % 500 - 50, 1,
+               datetime('now', '-' || (abs(random()) % 400) || ' days', '-' || (abs(random()) % 86400) || ' seconds')
+        FROM n
+    """.strip(), (n_games, n_players))
+    query._backfill_daily_points(conn)
+    query._backfill_player_stats(conn)
+    query._create_triggers(conn)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def database_path(args) -> str:
+    path = args.db or os.path.join(tempfile.gettempdir(),
+                                   f"hangman-bench-{args.players}-{args.games}-{args.guilds}.db")
+    if args.rebuild or not os.path.exists(path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"Building {path} with {args.players:,} players, {args.games:,} games and {args.guilds:,} guilds...")
+        start = time.perf_counter()
+        build_database(path, args.players, args.games, args.guilds)
+        print(f"Built in {time.perf_counter() - start:.1f}s\n")
+    return path
+
+
+def summarize(seconds: list[float], ops: int | None = None) -> dict[str, float]:
+    ordered = sorted(seconds)
+    return {
+        "median_ms": statistics.median(ordered) * 1e3,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3,
+        "ops_per_sec": (ops or len(ordered)) / sum(ordered),
+    }
+
+
+async def timed(function, iterations: int) -> list[float]:
+    for i in range(WARMUP):
+        await function(i)
+    seconds = []
+    for i in range(WARMUP, WARMUP + iterations):
+        start = time.perf_counter()
+        await function(i)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+async def run(args) -> dict[str, dict[str, float]]:
+    import main
+    import query
+    import words
+    import hangman
+    import options
+    from benchmarks.fakes import FakeGuild, FakeUser, FakeChannel, FakeInteraction, FakeWordnik
+
+    query.DB_PATH = database_path(args)
+    words.WOTD_PATH = os.path.join(tempfile.mkdtemp(), "wotd.json")
+    words.provider = FakeWordnik(WORDS)
+    await query.initialize_db(include_backup=False)
+    await words.refresh_word_of_the_day()
+    words.pool.start()
+    await asyncio.sleep(0.1)  # let the word pool fill
+
+    random.seed(args.seed)
+    guilds = [FakeGuild(guild_id) for guild_id in range(1, args.guilds + 1)]
+
+    def interaction(player_id: int) -> FakeInteraction:
+        guild = random.choice(guilds)
+        return FakeInteraction(FakeUser(10 ** 15 + player_id, guilds=[guild]), FakeChannel(guild))
+
+    results = {}
+    guesses = 0
+
+    async def play(i: int) -> None:
+        nonlocal guesses
+        fake = interaction(random.randint(1, args.players))
+        player = await hangman.Player.load(fake)
+        game = hangman.games.get(player.id) or await hangman.Hangman.load(player, fake.channel)
+        for letter in GUESS_ORDER:
+            if game.is_done:
+                break
+            await game.push_guess(letter)
+            guesses += i >= WARMUP
+
+    seconds = await timed(play, max(1, args.iterations // 10))
+    results["Hangman guesses"] = summarize(seconds, guesses)  # ops are guesses, latencies are whole games
+
+    async def load_cold(i: int) -> None:
+        hangman.players.clear()
+        await hangman.Player.load(interaction(random.randint(1, args.players)))
+
+    results["Player.load cold"] = summarize(await timed(load_cold, args.iterations))
+
+    warm_ids = [random.randint(1, args.players) for _ in range(50)]
+    for player_id in warm_ids:
+        await hangman.Player.load(interaction(player_id))
+
+    async def load_warm(i: int) -> None:
+        await hangman.Player.load(interaction(warm_ids[i % len(warm_ids)]))
+
+    results["Player.load warm"] = summarize(await timed(load_warm, args.iterations))
+
+    sample = [await hangman.Player.load(interaction(random.randint(1, args.players))) for _ in range(100)]
+
+    async def record(i: int) -> None:
+        await sample[i % len(sample)].record()
+
+    async def last_n_games(i: int) -> None:
+        await sample[i % len(sample)].last_n_games(options.NUM_GAMES_HISTORY)
+
+    results["Player.record"] = summarize(await timed(record, args.iterations))
+    results["Player.last_n_games"] = summarize(await timed(last_n_games, args.iterations))
+
+    for period in options.LEADERBOARD_PERIODS:
+        async def leaderboard(i: int, period=period) -> None:
+            hangman.leaderboards.clear()
+            await main.build_leaderboard(random.choice(guilds), period, options.DEFAULT_NUM_TOP_PLAYERS)
+
+        results[f"leaderboard {period}"] = summarize(await timed(leaderboard, args.iterations))
+
+    await query.flush()
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> bool:
+    """
+    Prints the results next to the baseline.
+
+    :return: Whether any benchmark's median got more than `tolerance` slower than its baseline. The median is compared
+             rather than the throughput, which a few stalls (a checkpoint, a page cache miss) can skew.
+    """
+    regressed = False
+    print(f"{'benchmark':<28}{'median':>11}{'p99':>11}{'ops/s':>12}{'baseline':>11}{'change':>9}")
+    for name, result in results.items():
+        line = f"{name:<28}{result['median_ms']:>9.2f}ms{result['p99_ms']:>9.2f}ms{result['ops_per_sec']:>12,.0f}"
+        if name in baseline:
+            change = result["median_ms"] / baseline[name]["median_ms"] - 1
+            line += f"{baseline[name]['median_ms']:>9.2f}ms{change:>+8.0%}"
+            if change > tolerance:
+                regressed = True
+                line += "  REGRESSION"
+        print(line)
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--games", type=int, default=2_000_000)
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="synthetic database to use, built if it doesn't exist")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the synthetic database first")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="where the baseline is stored")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction by which a benchmark's median may exceed its baseline before it is flagged")
+    args = parser.parse_args()
+
+    import query
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        query.close()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressed = compare(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved the baseline to {args.baseline}")
+    sys.exit(1 if regressed else 0)
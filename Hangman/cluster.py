@@ -0,0 +1,134 @@
+"""
+Runs the bot as a cluster of worker processes, each connecting its own contiguous range of shards to the gateway:
+
+    python cluster.py --processes 4 [--shards 16]
+
+Without --shards, the shard count Discord recommends for the bot is used. Workers share the SQLite database; worker 0
+also syncs commands and runs the backups. The backup database is restored before any worker starts, see
+`query.restore_at_startup`. A worker that crashes is restarted after `options.CLUSTER_RESTART_SECONDS`. Ctrl+C or
+SIGTERM stops every worker, giving each `options.CLUSTER_STOP_SECONDS` to commit its deferred writes.
+"""
+import os
+import time
+import query
+import signal
+import asyncio
+import options
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+
+def shard_ranges(shard_count: int, processes: int) -> list[list[int]]:
+    """
+    Splits the shards into `processes` contiguous ranges whose sizes differ by at most one.
+    """
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for cluster_id in range(processes):
+        end = start + size + (cluster_id < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [shard_ids for shard_ids in ranges if shard_ids]
+
+
+async def recommended_shard_count(token: str) -> int:
+    import discord
+
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(token)
+        shard_count, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+
+def run_worker(cluster_id: int, shard_ids: list[int], shard_count: int) -> None:
+    # main reads the shards it runs from the environment when it is imported
+    os.environ["CLUSTER_ID"] = str(cluster_id)
+    os.environ["SHARD_IDS"] = ",".join(map(str, shard_ids))
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    import main
+    main.run()
+
+
+def start_worker(context, cluster_id: int, shard_ids: list[int], shard_count: int) -> multiprocessing.Process:
+    process = context.Process(target=run_worker, args=(cluster_id, shard_ids, shard_count),
+                              name=f"hangman-cluster-{cluster_id}")
+    process.start()
+    print(f"Started cluster {cluster_id} (pid {process.pid}) with shards {shard_ids[0]}-{shard_ids[-1]}")
+    return process
+
+
+def print_shard_stats(shard_count: int) -> None:
+    conn = query.get_db_connection(read_only=True)
+    try:
+        rows = conn.execute("SELECT shard_id, guilds, latency_ms, updated_at FROM shard_stats WHERE shard_id < ? "
+                            "ORDER BY shard_id", (shard_count,)).fetchall()
+    except sqlite3.OperationalError:  # no worker has created the table yet
+        return
+    finally:
+        conn.close()
+    for shard_id, guilds, latency_ms, updated_at in rows:
+        latency = "-" if latency_ms is None else f"{latency_ms:.0f} ms"
+        print(f"Shard {shard_id}: {guilds:,} guilds, {latency} latency, reported {updated_at} UTC")
+    print(f"Total: {sum(row[1] for row in rows):,} guilds on {len(rows)} of {shard_count} shards")
+
+
+def stop_workers(workers: dict[int, multiprocessing.Process]) -> None:
+    # SIGTERM makes each worker close the bot and flush its deferred writes, see `main.run`
+    for process in workers.values():
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + options.CLUSTER_STOP_SECONDS
+    for cluster_id, process in workers.items():
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"Cluster {cluster_id} didn't stop within {options.CLUSTER_STOP_SECONDS:.0f}s, killing it")
+            process.kill()
+            process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Hangman as a cluster of sharded worker processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--shards", type=int, help="total number of shards, Discord's recommendation if not given")
+    args = parser.parse_args()
+
+    shard_count = args.shards or asyncio.run(recommended_shard_count(os.environ["DISCORD_TOKEN"]))
+    ranges = shard_ranges(shard_count, max(1, args.processes))
+    # before any worker serves, so no game is played against a partly restored database
+    asyncio.run(query.restore_at_startup())
+    query.close()
+    context = multiprocessing.get_context("spawn")  # workers import the bot fresh instead of inheriting this process
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    workers = {cluster_id: start_worker(context, cluster_id, shard_ids, shard_count)
+               for cluster_id, shard_ids in enumerate(ranges)}
+
+    last_report = time.monotonic()
+    try:
+        while workers and not stopping.wait(1):
+            for cluster_id, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0:  # stopped on purpose
+                    print(f"Cluster {cluster_id} exited")
+                    del workers[cluster_id]
+                    continue
+                print(f"Cluster {cluster_id} crashed with exit code {process.exitcode}, restarting...")
+                if stopping.wait(options.CLUSTER_RESTART_SECONDS):
+                    break
+                workers[cluster_id] = start_worker(context, cluster_id, ranges[cluster_id], shard_count)
+            if time.monotonic() - last_report >= options.SHARD_STATS_SECONDS:
+                last_report = time.monotonic()
+                print_shard_stats(shard_count)
+    except KeyboardInterrupt:
+        pass
+    stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
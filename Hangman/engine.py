@@ -0,0 +1,105 @@
+import string
+import options
+
+LETTERS = string.ascii_uppercase
+
+
+def letter_bit(letter: str) -> int:
+    return 1 << (ord(letter) - 65)
+
+
+def letters_mask(letters) -> int:
+    mask = 0
+    for letter in letters:
+        mask |= letter_bit(letter)
+    return mask
+
+
+VOWELS_MASK = letters_mask(options.VOWELS)
+CONSONANTS_MASK = letters_mask(options.CONSONANTS)
+Y_MASK = letter_bit("Y")
+
+
+class HangmanEngine:
+    """
+    The letter-guessing state of a single game, kept as 26-bit masks (bit 0 is "A").
+
+    Each letter's positions in the word are precomputed as a bitmask, and the counts of letters still hidden are
+    maintained as guesses come in, so a guess and the remaining-letter queries are all O(1).
+    """
+
+    __slots__ = ("word", "positions", "present", "vowels", "consonants", "guessed", "wrong", "letters_left",
+                 "vowels_left", "consonants_left")
+
+    def __init__(self, word: str, guessed_letters=()):
+        self.word = word
+        self.positions = [0] * 26  # letter index -> bitmask of its positions in the word
+        for i, letter in enumerate(word):
+            if letter in LETTERS:
+                self.positions[ord(letter) - 65] |= 1 << i
+        self.present = letters_mask(letter for letter in set(word) if letter in LETTERS)
+        # Y stands in for the vowels in words that have none
+        self.vowels = VOWELS_MASK if self.present & VOWELS_MASK else Y_MASK
+        self.consonants = CONSONANTS_MASK & ~self.vowels
+        self.guessed = 0
+        self.wrong = 0
+        self.letters_left = self.present.bit_count()
+        self.vowels_left = (self.present & self.vowels).bit_count()
+        self.consonants_left = (self.present & self.consonants).bit_count()
+        for letter in guessed_letters:
+            self.guess(letter)
+
+    def guess(self, letter: str) -> int:
+        """
+        Records a letter guess.
+
+        :return: How many times the letter appears in the word, 0 for a wrong (or repeated) guess
+        """
+        bit = letter_bit(letter) if letter in LETTERS else 0
+        if not bit or self.guessed & bit:
+            return 0
+        self.guessed |= bit
+        if not self.present & bit:
+            self.wrong |= bit
+            return 0
+        self.letters_left -= 1
+        if self.vowels & bit:
+            self.vowels_left -= 1
+        elif self.consonants & bit:
+            self.consonants_left -= 1
+        return self.positions[ord(letter) - 65].bit_count()
+
+    def is_guessed(self, letter: str) -> bool:
+        return letter in LETTERS and bool(self.guessed & letter_bit(letter))
+
+    def is_vowel(self, letter: str) -> bool:
+        return letter in LETTERS and bool(self.vowels & letter_bit(letter))
+
+    def is_solved(self) -> bool:
+        return self.letters_left == 0
+
+    def next_hidden(self, mask: int) -> str | None:
+        """
+        :return: The hidden letter from `mask` that appears first in the word, if any
+        """
+        candidates = self.present & ~self.guessed & mask
+        first, first_letter = None, None
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            index = bit.bit_length() - 1
+            position = self.positions[index] & -self.positions[index]
+            if first is None or position < first:
+                first, first_letter = position, LETTERS[index]
+        return first_letter
+
+    def guessed_letters(self) -> list[str]:
+        return [letter for i, letter in enumerate(LETTERS) if self.guessed >> i & 1]
+
+    def wrong_letters(self) -> list[str]:
+        return [letter for i, letter in enumerate(LETTERS) if self.wrong >> i & 1]
+
+    def progress(self, missing: str) -> str:
+        return " ".join(["\n" if letter == " " else missing
+                         if letter in LETTERS and not self.guessed & letter_bit(letter)
+                         else letter for letter in self.word])
@@ -1,12 +1,40 @@
+import io
+import os
 import json
+import cache
+import words
+import metrics
 import sqlite3
+import throttle
+import weakref
+import itertools
 
 import query
-import string
 import discord
 import options
-import pandas as pd
-from random_word import Wordnik
+from types import MappingProxyType
+from typing import NamedTuple
+from engine import HangmanEngine, LETTERS
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
+
+
+def _load_assets() -> MappingProxyType:
+    assets = {}
+    for name in os.listdir(ASSETS_DIR):
+        if name.startswith("hangman_") and name.endswith(".jpg"):
+            with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+                assets[name] = f.read()
+    return MappingProxyType(assets)
+
+
+# Every hangman image, read once at import so rendering a game never touches the disk
+ASSETS = _load_assets()
+
+
+def asset_file(name: str, filename: str) -> discord.File:
+    # BytesIO shares the immutable buffer until written to, so this doesn't copy the image
+    return discord.File(fp=io.BytesIO(ASSETS[name]), filename=filename)
 
 
 class InputLetterGuess(discord.ui.Modal):
@@ -17,10 +45,13 @@ class InputLetterGuess(discord.ui.Modal):
         self.user_input = discord.ui.TextInput(label="Letter", min_length=1, max_length=1)
         self.add_item(self.user_input)
 
+    @throttle.admitted("letter_guess")
+    @metrics.timed(metrics.COMPONENT_SECONDS, "letter_guess")
     async def on_submit(self, interaction: discord.Interaction):
-        image, embed = self.game.push_guess(self.user_input.value)
+        result = await self.game.push_guess(self.user_input.value)
         self.view = self.view if not self.game.is_done else None
-        if embed:
+        if result:
+            image, embed = result
             return await interaction.response.edit_message(attachments=[image], embed=embed, view=self.view)
         return await interaction.response.defer(ephemeral=True)
 
@@ -36,10 +67,13 @@ class InputWordGuess(discord.ui.Modal):
                                                placeholder=f"{self.word_length} characters required...")
         self.add_item(self.user_input)
 
+    @throttle.admitted("word_guess")
+    @metrics.timed(metrics.COMPONENT_SECONDS, "word_guess")
     async def on_submit(self, interaction: discord.Interaction):
-        image, embed = self.game.push_guess(self.user_input.value)
+        result = await self.game.push_guess(self.user_input.value)
         self.view = self.view if not self.game.is_done else None
-        if embed:
+        if result:
+            image, embed = result
             return await interaction.response.edit_message(attachments=[image], embed=embed, view=self.view)
         return await interaction.response.defer(ephemeral=True)
 
@@ -50,6 +84,7 @@ class HangmanButtonView(discord.ui.View):
         self.game = game
 
     @discord.ui.button(label="Guess Letter", style=discord.ButtonStyle.primary, row=1)
+    @metrics.timed(metrics.COMPONENT_SECONDS, "guess_letter")
     async def guess_letter(self, interaction: discord.Interaction, button: discord.Button):
         if interaction.user == self.game.user:
             return await interaction.response.send_modal(InputLetterGuess(self.game, view=self))
@@ -57,6 +92,7 @@ class HangmanButtonView(discord.ui.View):
                                                        delete_after=10, ephemeral=True)
 
     @discord.ui.button(label="Solve Puzzle", style=discord.ButtonStyle.primary, row=1)
+    @metrics.timed(metrics.COMPONENT_SECONDS, "solve_puzzle")
     async def solve_puzzle(self, interaction: discord.Interaction, button: discord.Button):
         if interaction.user == self.game.user:
             return await interaction.response.send_modal(InputWordGuess(self.game, view=self))
@@ -64,9 +100,11 @@ class HangmanButtonView(discord.ui.View):
                                                        delete_after=10, ephemeral=True)
 
     @discord.ui.button(label=f"Buy Vowel", row=2, style=discord.ButtonStyle.green, custom_id="vowel_button")
+    @throttle.admitted("buy_vowel", cost=2)
+    @metrics.timed(metrics.COMPONENT_SECONDS, "buy_vowel")
     async def buy_vowel(self, interaction: discord.Interaction, button: discord.Button):
         if interaction.user == self.game.user:
-            image, embed, is_active = self.game.buy_vowel()
+            image, embed, is_active = await self.game.buy_vowel()
             button.disabled = not is_active
             view = None if self.game.is_done else self
             if self.game.player.credits <= options.VOWEL_COST or self.game.vowels_left() == 0:
@@ -77,9 +115,11 @@ class HangmanButtonView(discord.ui.View):
                                                        delete_after=10, ephemeral=True)
 
     @discord.ui.button(label=f"Buy Consonant", row=2, style=discord.ButtonStyle.green, custom_id="consonant_button")
+    @throttle.admitted("buy_consonant", cost=2)
+    @metrics.timed(metrics.COMPONENT_SECONDS, "buy_consonant")
     async def buy_consonant(self, interaction: discord.Interaction, button: discord.Button):
         if interaction.user == self.game.user:
-            image, embed, is_active = self.game.buy_consonant()
+            image, embed, is_active = await self.game.buy_consonant()
             button.disabled = not is_active
             view = None if self.game.is_done else self
             if self.game.player.credits <= options.CONSONANT_COST:
@@ -90,217 +130,362 @@ class HangmanButtonView(discord.ui.View):
                                                        delete_after=10, ephemeral=True)
 
     @discord.ui.button(label="Quit", style=discord.ButtonStyle.danger, row=3)
+    @throttle.admitted("quit_game")
+    @metrics.timed(metrics.COMPONENT_SECONDS, "quit_game")
     async def quit_game(self, interaction: discord.Interaction, button: discord.Button):
         if interaction.user != self.game.user:
             return await interaction.response.send_message(content=f"Play your own game by using `/hangman`",
                                                            delete_after=10, ephemeral=True)
-        self.game.quit_game()
+        await self.game.quit_game()
         return await interaction.response.edit_message(content="You quit.", attachments=[], embed=None, view=None,
                                                        delete_after=5)
 
 
+class GameRecord(NamedTuple):
+    Word: str
+    Result: str
+    Points: int
+
+
+class PlayerStats(NamedTuple):
+    games_played: int = 0
+    wins: int = 0
+    losses: int = 0
+    total_points: int = 0
+    current_streak: int = 0
+    best_streak: int = 0
+
+
+class PlayerRow:
+    """
+    The cached `players` row for one Discord user. Every `Player` for that user shares the same instance, so credit and
+    point changes made by a game are seen by the user's next command without going back to the database.
+    """
+
+    __slots__ = ("id", "points", "credits", "__weakref__")
+
+    def __init__(self, id_: int, points: int, credits: int):
+        self.id = id_
+        self.points = points
+        self.credits = credits
+
+
 class Player:
     def __init__(self, interaction: discord.Interaction):
         self.user = interaction.user
         self.discord_id = self.user.id
-        self._load_or_create_player()
+        self._row: PlayerRow | None = None
 
-    def _load_or_create_player(self):
-        result = query.execute("SELECT id, points, credits FROM players WHERE discord_id = ?",
-                               (self.discord_id,), fetch=True)
-        if result:
-            self.id, self.points, self.credits = map(int, result)
+    @classmethod
+    async def load(cls, interaction: discord.Interaction) -> "Player":
+        player = cls(interaction)
+        await player._load_or_create_player()
+        return player
+
+    @property
+    def id(self) -> int:
+        return self._row.id
+
+    @property
+    def points(self) -> int:
+        return self._row.points
+
+    @points.setter
+    def points(self, value: int):
+        self._row.points = value
+
+    @property
+    def credits(self) -> int:
+        return self._row.credits
+
+    @credits.setter
+    def credits(self, value: int):
+        self._row.credits = value
+
+    async def _load_or_create_player(self):
+        self._row = players.get(self.discord_id)
+        if self._row is not None:
             return
 
-        with query.get_db_connection() as conn:
-            cursor = conn.cursor()
-            self.points = 0
-            self.credits = options.START_CREDITS
-            cursor.execute(
-                "INSERT INTO players (discord_id, points, credits) VALUES (?, ?, ?)",
-                (self.discord_id, self.points, self.credits)
-            )
-            self.id = cursor.lastrowid
-            mutual_guilds = self.user.mutual_guilds
-            for guild in mutual_guilds:
-                cursor.execute("INSERT INTO guild_members (guild_id, user_id) VALUES (?, ?)",
-                               (guild.id, self.id))
-            conn.commit()
-
-    def has_done_wotd(self) -> bool:
-        wotd = json.loads(Wordnik().word_of_the_day())["word"]
-        wotd = self.process_word(wotd)
-        result = query.execute("SELECT COUNT(*) FROM games WHERE player_id = ? AND word = ? AND is_wotd = 1",
-                               (self.id, wotd), fetch=True)
+        guild_ids = [guild.id for guild in self.user.mutual_guilds]
+
+        def load_or_create(conn: sqlite3.Connection) -> tuple[int, int, int]:
+            cursor = conn.execute("INSERT OR IGNORE INTO players (discord_id, points, credits) VALUES (?, ?, ?)",
+                                  (self.discord_id, 0, options.START_CREDITS))
+            if cursor.rowcount:
+                cursor.executemany("INSERT OR IGNORE INTO guild_members (guild_id, user_id) VALUES (?, ?)",
+                                   [(guild_id, cursor.lastrowid) for guild_id in guild_ids])
+            return conn.execute("SELECT id, points, credits FROM players WHERE discord_id = ?",
+                                (self.discord_id,)).fetchone()
+
+        await query.flush()  # credits may have deferred writes from before the row left the cache
+        result = await query.execute("SELECT id, points, credits FROM players WHERE discord_id = ?",
+                                     (self.discord_id,), fetch=True)
+        if not result:
+            result = await query.write(load_or_create)
+
+        # another command for this user may have filled the cache while this one was waiting on the database
+        self._row = players.get(self.discord_id)
+        if self._row is None:
+            # a game may still hold the row the cache dropped, which is refreshed rather than replaced so the game's
+            # later changes are seen by this command too
+            self._row = _player_rows.get(self.discord_id)
+            if self._row is None:
+                self._row = _player_rows[self.discord_id] = PlayerRow(*result)
+            else:
+                self._row.id, self._row.points, self._row.credits = result
+            players.put(self.discord_id, self._row)
+
+    async def has_done_wotd(self, word: str) -> bool:
+        result = await query.execute("SELECT COUNT(*) FROM games WHERE player_id = ? AND word = ? AND is_wotd = 1",
+                                     (self.id, self.process_word(word)), fetch=True)
         return result[0] if result else False
 
-    def has_active_game(self) -> bool:
-        result = query.execute("SELECT COUNT(*) FROM games WHERE player_id = ? AND is_done = 0",
-                               (self.id,), fetch=True)
+    async def has_active_game(self) -> bool:
+        result = await query.execute("SELECT COUNT(*) FROM games WHERE player_id = ? AND is_done = 0",
+                                     (self.id,), fetch=True)
         return result[0] > 0 if result else False
 
-    def points(self, days: int = 0) -> int:
+    async def points_since_days(self, days: int = 0) -> int:
         if days > 0:
-            result = query.execute(
+            result = await query.execute(
                 "SELECT SUM(points) FROM games WHERE player_id = ? AND created_at >= datetime('now', ?)",
                 (self.id, f"-{days} days"), fetch=True)
         else:
-            result = query.execute("SELECT points FROM players WHERE id = ?", (self.id,), fetch=True)
+            result = await query.execute("SELECT points FROM players WHERE id = ?", (self.id,), fetch=True)
         return result[0] if result else 0
 
-    def record(self, days: int = 0) -> tuple[int, int]:
-        self._load_or_create_player()
-        if days > 0:
-            results = query.execute(
-                "SELECT lives FROM games WHERE player_id = ? AND is_done = 1 AND "
-                "created_at >= datetime('now', ?)",
-                (self.id, days), fetch_one=False
-            )
-        else:
-            results = query.execute("SELECT lives FROM games WHERE player_id = ? AND is_done = 1",
-                                    (self.id,), fetch_one=False)
+    async def stats(self) -> PlayerStats:
+        """
+        The player's finished games, points and win streaks, from the `player_stats` row `Hangman` keeps up to date.
+        """
+        result = await query.execute("SELECT games_played, wins, losses, total_points, current_streak, best_streak "
+                                     "FROM player_stats WHERE player_id = ?", (self.id,), fetch=True)
+        return PlayerStats(*result) if result else PlayerStats()
+
+    async def record(self, days: int = 0) -> tuple[int, int]:
+        if days <= 0:
+            stats = await self.stats()
+            return stats.wins, stats.losses
+        results = await query.execute(
+            "SELECT lives FROM games WHERE player_id = ? AND is_done = 1 AND "
+            "created_at >= datetime('now', ?)",
+            (self.id, days), fetch_one=False
+        )
         wins = sum(result[0] > 0 for result in results)
         losses = len(results) - wins
         return wins, losses
 
-    def num_games_since_days(self, days: int) -> int:
-        result = query.execute("SELECT COUNT(*) FROM games WHERE player_id = ? AND created_at >= datetime('now', ?)",
-                               (self.id, f"-{days} days"), fetch=True)
+    async def num_games_since_days(self, days: int) -> int:
+        result = await query.execute(
+            "SELECT COUNT(*) FROM games WHERE player_id = ? AND created_at >= datetime('now', ?)",
+            (self.id, f"-{days} days"), fetch=True)
         return result[0] if result else 0
 
-    def num_games(self) -> int:
-        result = query.execute("SELECT COUNT(*) FROM games WHERE player_id = ?", (self.id,), fetch=True)
+    async def num_games(self) -> int:
+        result = await query.execute("SELECT COUNT(*) FROM games WHERE player_id = ?", (self.id,), fetch=True)
         return result[0] if result else 0
 
-    def last_n_games(self, n: int = 5) -> pd.DataFrame:
-        games = query.execute(
+    async def last_n_games(self, n: int = 5) -> list["GameRecord"]:
+        games = await query.execute(
             "SELECT word, is_done, lives, points FROM games WHERE player_id = ? ORDER BY created_at DESC LIMIT ?",
             (self.id, n), fetch=True, fetch_one=False)
-        if games:
-            df = pd.DataFrame(columns=["Word", "Result", "Points"])
-            for i, (word, is_done, lives, points) in enumerate(games):
-                result = "Win" if is_done and lives > 0 else "Loss"
-                df.loc[i] = (word.title(), result, points)
-            return df
-        return pd.DataFrame(columns=["Word", "Result", "Points"])
+        return [GameRecord(word.title(), "Win" if is_done and lives > 0 else "Loss", points)
+                for word, is_done, lives, points in games]
 
     @staticmethod
     def process_word(word: str) -> str:
         return str(word).strip().upper()
 
 
+class GameRegistry:
+    """
+    The live `Hangman` games in this process, keyed by player id and game id, so resuming a game doesn't reload and
+    re-parse it from SQLite. Least recently used games are dropped past `max_games` and all games after `ttl` seconds;
+    a dropped game is simply loaded from the database again.
+    """
+
+    def __init__(self, max_games: int = options.GAME_REGISTRY_MAX_GAMES, ttl: float = options.GAME_REGISTRY_TTL):
+        self._by_player = cache.LRUCache(max_games, ttl, on_evict=self._evicted)
+        self._player_ids: dict[int, int] = {}  # game id -> player id
+
+    def get(self, player_id: int) -> "Hangman | None":
+        return self._by_player.get(player_id)
+
+    def get_by_id(self, game_id: int) -> "Hangman | None":
+        player_id = self._player_ids.get(game_id)
+        return None if player_id is None else self.get(player_id)
+
+    def add(self, game: "Hangman") -> None:
+        self._by_player.put(game.player.id, game)
+        self._player_ids[game.id] = game.player.id
+
+    def remove(self, game: "Hangman") -> None:
+        if self._player_ids.pop(game.id, None) is not None:
+            self._by_player.pop(game.player.id)
+
+    def _evicted(self, player_id: int, game: "Hangman") -> None:
+        self._player_ids.pop(game.id, None)
+
+    def stats(self) -> dict[str, float]:
+        return self._by_player.stats()
+
+
+def invalidate_leaderboards(*guild_ids: int) -> None:
+    guild_ids = set(guild_ids)
+    leaderboards.discard_where(lambda key: key[0] in guild_ids)
+
+
 class Hangman:
     def __init__(self, player: Player, channel: discord.TextChannel, id_: int = None):
         self.player = player
         self.channel = channel
         self.user = player.user
+        self.id = id_
+        self.view = HangmanButtonView(self)
 
+    @classmethod
+    async def load(cls, player: Player, channel: discord.TextChannel, id_: int = None) -> "Hangman":
+        game = cls(player, channel, id_)
         if id_:
-            self.id = id_
-            self._load_game_state()
+            await query.flush()  # the game may have deferred writes from before it left the registry
+            await game._load_game_state()
         else:
-            self.word, self.definitions, self.is_wotd = self.get_word()
-            self.progress = " ".join([options.MISSING_LETTER_EMOJI if letter in string.ascii_uppercase
-                                      else "\n" if letter == " " else letter for letter in self.word])
-            self.lives = options.NUM_LIVES
-            self.points = 0
-            self.is_done = False
-            self._save_new_game()
-
+            game.word, game.definitions, game.is_wotd = await game.get_word()
+            game.engine = HangmanEngine(game.word)
+            game.lives = options.NUM_LIVES
+            game.points = 0
+            game.is_done = False
+            await game._save_new_game()
+            metrics.GAMES_STARTED.inc("wotd" if game.is_wotd else "random")
+        if not game.is_done:
+            games.add(game)
+        return game
+
+    def resume(self, player: Player, channel: discord.TextChannel) -> None:
+        """
+        Rebinds a game from the registry to the player and channel of a new interaction.
+        """
+        self.player = player
+        self.channel = channel
+        self.user = player.user
         self.view = HangmanButtonView(self)
 
-    def _save_new_game(self):
-        self.guessed_letters = []
+    @property
+    def progress(self) -> str:
+        return self.engine.progress(options.MISSING_LETTER_EMOJI)
+
+    @property
+    def guessed_letters(self) -> list[str]:
+        return self.engine.guessed_letters()
+
+    @property
+    def wrong_letters(self) -> list[str]:
+        return self.engine.wrong_letters()
+
+    async def _save_new_game(self):
         self.guessed_words = []
-        self.wrong_letters = []
-
-        with query.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO games (player_id, channel_id, word, is_wotd, lives, progress, guessed_letters, guessed_words, wrong_letters, definitions) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (self.player.id, self.channel.id, self.word, int(self.is_wotd), self.lives, self.progress,
-                 json.dumps(self.guessed_letters), json.dumps(self.guessed_words), json.dumps(self.wrong_letters),
-                 json.dumps(self.definitions))
-            )
-            conn.commit()
-            self.id = cursor.lastrowid
-
-    def _load_game_state(self):
-        result = query.execute(
+
+        self.id = await query.execute(
+            "INSERT INTO games (player_id, channel_id, word, is_wotd, lives, progress, guessed_letters, guessed_words, wrong_letters, definitions) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.player.id, self.channel.id, self.word, int(self.is_wotd), self.lives, self.progress,
+             json.dumps(self.guessed_letters), json.dumps(self.guessed_words), json.dumps(self.wrong_letters),
+             json.dumps(self.definitions)),
+            commit=True
+        )
+
+    async def _load_game_state(self):
+        result = await query.execute(
             "SELECT word, lives, is_done, progress, guessed_letters, guessed_words, wrong_letters, definitions, "
             "points, is_wotd FROM games WHERE id = ?", (self.id,), fetch=True)
         if result:
-            (self.word, self.lives, self.is_done, self.progress, guessed_letters,
-             guessed_words, wrong_letters, definitions, self.points, self.is_wotd) = result
-            self.guessed_letters = json.loads(guessed_letters)
+            (self.word, self.lives, self.is_done, _, guessed_letters,
+             guessed_words, _, definitions, self.points, self.is_wotd) = result
+            self.engine = HangmanEngine(self.word, json.loads(guessed_letters))
             self.guessed_words = json.loads(guessed_words)
-            self.wrong_letters = json.loads(wrong_letters)
             self.definitions = json.loads(definitions)
             return
 
         print("Failed to load game state...")
 
     def _update_game_state(self):
-        query.execute(
+        # write-behind: consecutive guesses are coalesced into a single UPDATE
+        query.defer(
+            ("games", self.id),
             "UPDATE games SET lives = ?, is_done = ?, progress = ?, guessed_letters = ?, guessed_words = ?, wrong_letters = ?, points = ? WHERE id = ?",
             (self.lives, int(self.is_done), self.progress, json.dumps(self.guessed_letters),
-             json.dumps(self.guessed_words), json.dumps(self.wrong_letters), self.points, self.id),
-            commit=True
+             json.dumps(self.guessed_words), json.dumps(self.wrong_letters), self.points, self.id)
         )
 
-    def get_word(self) -> tuple[str, list, bool]:
-        wordnik = Wordnik()
-        do_wotd = not self.player.has_done_wotd()
+    async def _finish_game(self) -> None:
+        self._update_game_state()
+        await query.flush(self._finish)
+        invalidate_leaderboards(*(guild.id for guild in self.user.mutual_guilds))
+
+    def _finish(self, conn: sqlite3.Connection) -> None:
+        # runs in the same transaction as the final game state flush
+        conn.execute("UPDATE players SET points = points + ? WHERE id = ?", (self.points, self.player.id))
+        conn.execute("INSERT INTO player_daily_points (player_id, day, points) "
+                     "SELECT player_id, date(created_at), points FROM games WHERE id = ? "
+                     "ON CONFLICT (player_id, day) DO UPDATE SET points = points + excluded.points", (self.id,))
+        # every SET expression sees the row as it was before this game
+        won = int(self.lives > 0)
+        conn.execute("INSERT INTO player_stats (player_id, games_played, wins, losses, total_points, current_streak, "
+                     "best_streak) VALUES (?, 1, ?, ?, ?, ?, ?) "
+                     "ON CONFLICT (player_id) DO UPDATE SET games_played = games_played + 1, "
+                     "wins = wins + excluded.wins, losses = losses + excluded.losses, "
+                     "total_points = total_points + excluded.total_points, "
+                     "current_streak = (current_streak + 1) * excluded.wins, "
+                     "best_streak = MAX(best_streak, (current_streak + 1) * excluded.wins)",
+                     (self.player.id, won, 1 - won, self.points, won, won))
+        query.bump_guild_versions(conn, self.player.id)
+
+    def _update_credits(self, cost: int):
+        # relative and never coalesced, so purchases made through other processes' cached rows aren't overwritten
+        query.defer(("players.credits", next(_purchases)), "UPDATE players SET credits = credits - ? WHERE id = ?",
+                    (cost, self.player.id))
+
+    async def get_word(self) -> tuple[str, list, bool]:
+        wotd = await words.word_of_the_day()
+        do_wotd = wotd is not None and not await self.player.has_done_wotd(wotd[0])
         if do_wotd:
-            wotd = json.loads(wordnik.word_of_the_day())
-            word = self.player.process_word(wotd["word"])
-            definitions = wotd["definitions"]
-            return word, definitions, do_wotd
-        word = self.player.process_word(wordnik.get_random_word())
+            word, definitions = wotd
+            return self.player.process_word(word), definitions, do_wotd
+        word = self.player.process_word(await words.pool.get())
         return word, list(), do_wotd
 
     def vowels_left(self) -> int:
-        num_vowels = sum(vowel in self.word for vowel in options.VOWELS)
-        if num_vowels == 0:
-            return "Y" not in self.progress
-        num_vowels -= sum(letter in options.VOWELS for letter in self.guessed_letters)
-        return num_vowels
+        return self.engine.vowels_left
 
-    def buy_vowel(self) -> tuple[discord.File | None, discord.Embed | None, bool]:
+    async def buy_vowel(self) -> tuple[discord.File | None, discord.Embed | None, bool]:
         if self.vowels_left() == 0:
-            image, embed, view = self.current_progress()
+            image, embed, view = await self.current_progress()
             return image, embed, False
         self.player.credits -= options.VOWEL_COST
-        query.execute("UPDATE players SET credits = ? WHERE id = ?", (self.player.credits, self.player.id), commit=True)
+        self._update_credits(options.VOWEL_COST)
 
-        temp = "@"
-        progress = self.progress.replace(options.MISSING_LETTER_EMOJI, temp)
-        for i, letter in enumerate(progress.split()):
-            if letter == temp and self.word[i] in options.VOWELS:
-                image, embed = self.update_progress(self.word[i], options.POINTS["LETTER"]["VOWEL"]["CORRECT"])
-                return image, embed, self.vowels_left() > 0 and self.player.credits >= options.VOWEL_COST
-        return None, None, False
+        vowel = self.engine.next_hidden(self.engine.vowels)
+        if vowel is None:
+            return None, None, False
+        image, embed = await self.update_progress(vowel, options.POINTS["LETTER"]["VOWEL"]["CORRECT"])
+        return image, embed, self.vowels_left() > 0 and self.player.credits >= options.VOWEL_COST
 
     def consonants_left(self) -> int:
-        num_consonants = sum(c in options.CONSONANTS for c in set(self.word) if c not in self.progress)
-        num_vowels = self.vowels_left()
-        return num_consonants - int(num_vowels == 0)
+        return self.engine.consonants_left
 
-    def buy_consonant(self) -> tuple[discord.File | None, discord.Embed | None, bool]:
+    async def buy_consonant(self) -> tuple[discord.File | None, discord.Embed | None, bool]:
         if self.consonants_left() == 0:
-            image, embed, view = self.current_progress()
+            image, embed, view = await self.current_progress()
             return image, embed, False
         self.player.credits -= options.CONSONANT_COST
-        query.execute("UPDATE players SET credits = ? WHERE id = ?", (self.player.credits, self.player.id), commit=True)
+        self._update_credits(options.CONSONANT_COST)
 
-        temp = "@"
-        progress = self.progress.replace(options.MISSING_LETTER_EMOJI, temp)
-        for i, letter in enumerate(progress.split()):
-            if letter == temp and self.word[i] in options.CONSONANTS:
-                image, embed = self.update_progress(self.word[i], options.POINTS["LETTER"]["CONSONANT"]["CORRECT"])
-                return image, embed, self.consonants_left() > 0 and self.player.credits >= options.CONSONANT_COST
-        return None, None, False
+        consonant = self.engine.next_hidden(self.engine.consonants)
+        if consonant is None:
+            return None, None, False
+        image, embed = await self.update_progress(consonant, options.POINTS["LETTER"]["CONSONANT"]["CORRECT"])
+        return image, embed, self.consonants_left() > 0 and self.player.credits >= options.CONSONANT_COST
 
     def format_definitions(self) -> str:
         def format_definition(definition: dict) -> str:
@@ -313,50 +498,50 @@ class Hangman:
         return "\n".join(
             [f"Definitions:"] + [f"{i + 1}) {format_definition(d)}" for i, d in enumerate(self.definitions)])
 
-    def quit_game(self) -> None:
-        # remove points from player profile
-        query.execute("UPDATE players SET points = points - ? WHERE id = ?", params=(self.points, self.player.id),
-                      commit=True)
-        query.execute("DELETE FROM games WHERE id = ?", (self.id,), commit=True)
-        del self
+    async def quit_game(self) -> None:
+        def quit_(conn: sqlite3.Connection) -> None:
+            # remove points from player profile
+            conn.execute("UPDATE players SET points = points - ? WHERE id = ?", (self.points, self.player.id))
+            conn.execute("DELETE FROM games WHERE id = ?", (self.id,))
+            conn.execute("UPDATE player_stats SET current_streak = 0 WHERE player_id = ?", (self.player.id,))
+
+        games.remove(self)
+        self.player.points -= self.points
+        await query.flush(quit_)
+        metrics.GAMES_FINISHED.inc("quit")
 
     def start_game(self) -> tuple[discord.File, discord.Embed, discord.ui.View]:
         title = "H_NGM_N\n__WORD OF THE DAY__" if self.is_wotd else "H_NGM_N"
         content = f"{self.progress}\n\n{' '.join([options.LIVES_EMOJI] * self.lives)}"
-        image = discord.File(fp=f"assets/hangman_{self.lives}.jpg", filename="image.jpg")
+        image = asset_file(f"hangman_{self.lives}.jpg", filename="image.jpg")
         embed = discord.Embed(title=title, description=content.strip(),
                               color=discord.Color.from_rgb(*options.LIVES_LEFT[self.lives]))
         embed.set_image(url="attachment://image.jpg")
         return image, embed, self.view
 
-    def update_progress(self, guess: str, price: int = 0) -> tuple[discord.File, discord.Embed]:
+    async def update_progress(self, guess: str, price: int = 0) -> tuple[discord.File, discord.Embed]:
         if len(guess) == 1:
-            is_vowel = guess in options.VOWELS if sum(self.word.count(v) for v in options.VOWELS) else guess == "Y"
-            self.guessed_letters.append(guess)
-            if guess not in self.word:
-                self.wrong_letters.append(guess)
+            is_vowel = self.engine.is_vowel(guess)
+            hits = self.engine.guess(guess)
+            if hits == 0:
                 if price == 0:
                     self.points += options.POINTS["LETTER"]["VOWEL" if is_vowel else "CONSONANT"]["INCORRECT"]
                 self.lives -= 1
                 if self.lives == 0:
-                    return self.lose(price)
+                    return await self.lose(price)
             elif price == 0:
-                self.points += options.POINTS["LETTER"]["VOWEL" if is_vowel else "CONSONANT"][
-                                   "CORRECT"] * self.word.count(guess)
-            self.progress = " ".join(["\n" if letter == " " else options.MISSING_LETTER_EMOJI
-                                      if letter not in self.guessed_letters and letter in string.ascii_uppercase
-                                      else letter for letter in self.word])
-            if self.progress.count(options.MISSING_LETTER_EMOJI) == 0:
-                return self.win(price)
+                self.points += options.POINTS["LETTER"]["VOWEL" if is_vowel else "CONSONANT"]["CORRECT"] * hits
+            if self.engine.is_solved():
+                return await self.win(price)
         else:
             self.guessed_words.append(guess)
             if guess == self.word:
                 self.points += options.POINTS["WORD"]["CORRECT"]
-                return self.win(price)
+                return await self.win(price)
             self.points += options.POINTS["WORD"]["INCORRECT"]
             self.lives -= 1
             if self.lives == 0:
-                return self.lose(price)
+                return await self.lose(price)
 
         content = [
             self.progress + "\n",
@@ -374,77 +559,76 @@ class Hangman:
         embed = discord.Embed(title="H_NGM_N\n__WORD OF THE DAY__" if self.is_wotd else "H_NGM_N",
                               description="\n".join(content),
                               color=discord.Color.from_rgb(*options.LIVES_LEFT[self.lives]))
-        image = discord.File(fp=f"assets/hangman_{self.lives}.jpg", filename="image.jpg")
+        image = asset_file(f"hangman_{self.lives}.jpg", filename="image.jpg")
         embed.set_image(url="attachment://image.jpg")
 
         self._update_game_state()
         return image, embed
 
-    def win(self, price: int = 0) -> tuple[discord.File, discord.Embed]:
+    async def win(self, price: int = 0) -> tuple[discord.File, discord.Embed]:
         word = self.word.title()
         definitions = self.format_definitions()
 
         self.is_done = True
+        games.remove(self)
         self.points += options.POINTS["WIN"]
         self.points += options.POINTS["LIVES"] * self.lives
         self.points *= options.POINTS["WOTD"] if self.is_wotd else 1
         self.player.points += self.points
 
-        query.execute("UPDATE players SET points = points + ? WHERE id = ?",
-                      (self.points, self.player.id), commit=True)
-
         is_int = int(self.points) == float(self.points)
         content = (f"🎉 **You Won!** The word{' of the day' if self.is_wotd else ''} was **{word}**!\n\n"
                    f"You got **{self.points:.{'0' if is_int else '1'}f}** points!\n\n{definitions}")
         if price > 0:
             content += f"\n\nYou have {self.player.credits} {options.CREDIT_EMOJI} remaining!"
 
-        image = discord.File(fp=f"assets/hangman_{self.lives}_win.jpg", filename="win.jpg")
+        image = asset_file(f"hangman_{self.lives}_win.jpg", filename="win.jpg")
         embed = discord.Embed(title="💀 Game Over!", description=content.strip(), color=discord.Color.green())
         embed.set_image(url="attachment://win.jpg")
 
-        self._update_game_state()
+        await self._finish_game()
+        metrics.GAMES_FINISHED.inc("win")
         return image, embed
 
-    def lose(self, price: int = 0) -> tuple[discord.File, discord.Embed]:
+    async def lose(self, price: int = 0) -> tuple[discord.File, discord.Embed]:
         word = self.word.title()
         definitions = self.format_definitions()
 
         self.lives = 0
         self.is_done = True
+        games.remove(self)
         self.points += options.POINTS["LOSS"]
         self.points *= options.POINTS["WOTD"] if self.is_wotd else 1
         self.player.points += self.points
 
-        query.execute("UPDATE players SET points = points + ? WHERE id = ?", (self.points, self.player.id), commit=True)
-
         is_int = int(self.points) == float(self.points)
         content = (f"The word{' of the day' if self.is_wotd else ''} was **{word}.**\n\n"
                    f"You got **{self.points:.{'0' if is_int else '1'}f}** points.\n\n{definitions}")
         if price > 0:
             content += f"\n\nYou have {self.player.credits} {options.CREDIT_EMOJI} remaining."
 
-        image = discord.File(fp="assets/hangman_0.jpg", filename="lose.jpg")
+        image = asset_file("hangman_0.jpg", filename="lose.jpg")
         embed = discord.Embed(title="💀 Game Over!", description=content.strip(), color=discord.Color.red())
         embed.set_image(url="attachment://lose.jpg")
 
-        self._update_game_state()
+        await self._finish_game()
+        metrics.GAMES_FINISHED.inc("loss")
         return image, embed
 
-    def push_guess(self, guess: str):
+    async def push_guess(self, guess: str):
         guess = self.player.process_word(guess)
-        if len(guess) == 1 and guess in self.guessed_letters:
+        if len(guess) == 1 and (guess not in LETTERS or self.engine.is_guessed(guess)):
             return
         if guess in self.guessed_words:
             return
-        return self.update_progress(guess)
+        return await self.update_progress(guess)
 
-    def current_progress(self) -> tuple[discord.File, discord.Embed, discord.ui.View | None]:
+    async def current_progress(self) -> tuple[discord.File, discord.Embed, discord.ui.View | None]:
         if self.is_win():
-            image, embed = self.win(self.points)
+            image, embed = await self.win(self.points)
             return image, embed, None
         if self.lives == 0:
-            image, embed = self.win(self.points)
+            image, embed = await self.win(self.points)
             return image, embed, None
 
         content = [
@@ -461,8 +645,7 @@ class Hangman:
         embed = discord.Embed(title="H_NGM_N\n__WORD OF THE DAY__" if self.is_wotd else "H_NGM_N",
                               description="\n".join(content),
                               color=discord.Color.from_rgb(*options.LIVES_LEFT[self.lives]))
-        image = discord.File(fp=f"assets/hangman_{self.lives}{'_win' if self.is_win() else ''}.jpg",
-                             filename="image.jpg")
+        image = asset_file(f"hangman_{self.lives}{'_win' if self.is_win() else ''}.jpg", filename="image.jpg")
         embed.set_image(url="attachment://image.jpg")
 
         return image, embed, self.view
@@ -480,3 +663,15 @@ class Hangman:
             f"Points: {self.points}",
             f"Is Done: {self.is_done}"
         ])
+
+
+games = GameRegistry()
+# (guild version, ranked rows, rendered table) keyed by (guild id, period, number of top players), see
+# `main.build_leaderboard`
+leaderboards = cache.LRUCache(options.LEADERBOARD_CACHE_SIZE, options.LEADERBOARD_CACHE_TTL)
+# Player rows keyed by Discord id, see `PlayerRow`
+players = cache.LRUCache(options.PLAYER_CACHE_SIZE, options.PLAYER_CACHE_TTL)
+# Every player row still in use, cached or not, see `Player._load_or_create_player`
+_player_rows: "weakref.WeakValueDictionary[int, PlayerRow]" = weakref.WeakValueDictionary()
+# Distinct write-behind keys for credit purchases
+_purchases = itertools.count()
@@ -1,19 +1,48 @@
+import time
+STARTED_AT = time.monotonic()  # taken before the imports below so the startup time includes them
+
+import io
 import os
+import math
 import query
+import signal
+import words
+import asyncio
+import metrics
 import discord
 import options
+import sqlite3
+import tracing
 import datetime
-import pandas as pd
-from tabulate import tabulate
+import throttle
+import contextlib
 from discord import app_commands
 from discord.ext import commands, tasks
-from hangman import Hangman, Player
+from typing import NamedTuple
+from collections import Counter
+from hangman import Hangman, Player, GameRecord, games, players, leaderboards, invalidate_leaderboards
 
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix=options.PREFIX, intents=intents)
+# Set by cluster.py for each worker process. Without them one process runs every shard Discord recommends.
+SHARD_IDS = [int(shard_id) for shard_id in os.environ["SHARD_IDS"].split(",")] if os.environ.get("SHARD_IDS") else None
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+CLUSTER_ID = int(os.environ.get("CLUSTER_ID", 0))
+IS_PRIMARY = CLUSTER_ID == 0  # runs the once-per-cluster work: command sync, backups, snapshots and the restore
+bot = commands.AutoShardedBot(command_prefix=options.PREFIX, intents=intents, shard_ids=SHARD_IDS,
+                              shard_count=SHARD_COUNT, http_trace=tracing.http_trace_config())
+ready_seconds: float | None = None  # seconds from process start to the first on_ready
+metrics_server: asyncio.AbstractServer | None = None
+
+metrics.register_stats("word_pool", words.pool.stats)
+metrics.register_stats("game_registry", games.stats)
+metrics.register_stats("player_cache", players.stats)
+metrics.register_stats("leaderboard_cache", leaderboards.stats)
+metrics.register_stats("restore", lambda: query.restore_progress)
+metrics.register_stats("admission", throttle.admission.stats)
+metrics.register_stats("shards", lambda: {"guilds": len(bot.guilds), "latency_seconds": bot.latency})
 
 
 @bot.event
@@ -21,16 +50,32 @@ async def on_ready():
     """
     Initializes databases and syncs commands when the bot starts up.
     """
-    await query.initialize_db()
-    await query.backup_to_main_etl()
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(e)
+    global metrics_server
+    await query.initialize_db(include_backup=IS_PRIMARY)
+    if metrics_server is None and options.METRICS_PORT is not None:
+        metrics_server = await metrics.serve(options.METRICS_HOST, options.METRICS_PORT + CLUSTER_ID)
+    await words.refresh_word_of_the_day()
+    words.pool.start()
+    if not refresh_wotd.is_running():
+        refresh_wotd.start()
+    if not report_shards.is_running():
+        report_shards.start()
+    if IS_PRIMARY:
+        if not backup_db.is_running():
+            backup_db.start()
+        if not snapshot_db.is_running():
+            snapshot_db.start()
+        try:
+            synced = await bot.tree.sync()
+            print(f"Synced {len(synced)} command(s)")
+        except Exception as e:
+            print(e)
 
     await update_server_count()
-    print(f"Bot is ready as {bot.user}!")
+    global ready_seconds
+    if ready_seconds is None:  # on_ready fires again after every reconnect
+        ready_seconds = time.monotonic() - STARTED_AT
+    print(f"Bot is ready as {bot.user} after {ready_seconds:.2f}s!")
 
 
 @bot.event
@@ -57,19 +102,8 @@ async def on_guild_join(guild: discord.Guild):
     embed.set_thumbnail(url=bot.user.avatar.url)
     await channel.send(embed=embed)
 
-    player_ids = pd.read_sql("SELECT players.id, players.discord_id, guild_members.guild_id FROM players "
-                             "JOIN guild_members ON players.id = guild_members.user_id", con=query.get_db_connection())
-    # Columns: [id, discord_id, guild_id]
-    players_to_add = []
-    for member in guild.members:
-        id_ = player_ids[player_ids["discord_id"] == member.id]["id"]
-        if len(id_) > 0:
-            players_to_add.append(id_.iloc[0])
-
-    if len(players_to_add) > 0:
-        values = [f"({guild.id}, {player_id})" for player_id in players_to_add]
-        query.execute(f"INSERT INTO guild_members (guild_id, user_id) VALUES {', '.join(values)}", commit=True,
-                      fetch=False)
+    if await query.sync_guild_members(guild.id, (member.id for member in guild.members)) > 0:
+        invalidate_leaderboards(guild.id)
 
     await update_server_count()
 
@@ -81,27 +115,75 @@ async def on_guild_remove(guild: discord.Guild):
 
     :param guild: The guild the bot was removed from
     """
-    query.execute(f"DELETE FROM guild_members WHERE guild_id = {guild.id}", commit=True, fetch=False)
+    await query.execute("DELETE FROM guild_members WHERE guild_id = ?", (guild.id,), commit=True, fetch=False)
+    invalidate_leaderboards(guild.id)
     await update_server_count()
 
 
+def shard_stats() -> list[tuple[int, int, float | None]]:
+    """
+    :return: (shard id, number of guilds, latency in milliseconds or None before the first heartbeat) for each shard
+             this process runs
+    """
+    guilds = Counter(guild.shard_id for guild in bot.guilds)
+    stats = []
+    for shard_id, shard in sorted(bot.shards.items()):
+        latency = shard.latency * 1000 if math.isfinite(shard.latency) else None
+        stats.append((shard_id, guilds[shard_id], latency))
+    return stats
+
+
 async def update_server_count():
-    num_servers = len(bot.guilds)
+    await query.report_shards(shard_stats())
+    num_servers = await query.count_guilds(bot.shard_count)  # includes the shards run by other processes
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.playing,
                                                         name=f"/hangman in {num_servers:,} servers"))
 
 
+@tasks.loop(seconds=options.SHARD_STATS_SECONDS)
+async def report_shards() -> None:
+    """
+    Reports this process's shards to the `shard_stats` SQL table and picks up the server count of the whole cluster.
+
+    :return: None
+    """
+    await update_server_count()
+
+
 @tasks.loop(time=datetime.time(tzinfo=options.TZ))  # update at midnight in preferred timezone
 async def backup_db() -> None:
     """
-    Backs up the main database to the backup database every 24 hours at midnight in the preferred timezone.
+    Copies the rows changed since the last backup to the backup database every 24 hours at midnight in the preferred
+    timezone.
+
+    :return: None
+    """
+    await query.sync_backup()
+
+
+@tasks.loop(minutes=options.SNAPSHOT_INTERVAL_MINUTES)
+async def snapshot_db() -> None:
+    """
+    Saves a local snapshot of the database every `options.SNAPSHOT_INTERVAL_MINUTES` minutes.
 
     :return: None
     """
-    await query.main_to_backup_etl()
+    await query.take_snapshot()
+
+
+@tasks.loop(time=datetime.time(tzinfo=options.TZ))  # refresh at midnight in preferred timezone
+async def refresh_wotd() -> None:
+    """
+    Fetches the new word of the day as soon as it changes so no player has to wait on Wordnik for it.
+
+    :return: None
+    """
+    await words.refresh_word_of_the_day()
 
 
 @bot.tree.command(name="hangman", description="Simulates the Hangman game!")
+@throttle.admitted("hangman")
+@metrics.timed(metrics.COMMAND_SECONDS, "hangman")
 async def hangman(interaction: discord.Interaction):
     """
     Simulates the Hangman game!
@@ -110,27 +192,106 @@ async def hangman(interaction: discord.Interaction):
     :return: Followup to the initial interaction
     """
     await interaction.response.defer(ephemeral=True)
-    player = Player(interaction)
-
-    result = query.execute("SELECT id, channel_id FROM games WHERE player_id = ? AND is_done = ?",
-                           (player.id, 0), fetch=True)
-    if result:
-        game_id, active_channel_id = result
-        if active_channel_id == interaction.channel.id:
-            game = Hangman(player, interaction.channel, game_id)
-            image, embed, view = game.current_progress()
-            return await interaction.followup.send(file=image, embed=embed, view=view, ephemeral=True)
-        game_channel = bot.get_channel(active_channel_id)
-        game_server = game_channel.guild
-        content = f"You already have an active game in {game_server.name}'s {game_channel.jump_url}."
-        embed = discord.Embed(title=f"You can't play here, {player.user.mention}...",
-                              description=content, color=discord.Color.red())
-        embed.set_thumbnail(url=bot.user.avatar.url)
-        return await interaction.followup.send(embed=embed, ephemeral=True)
-
-    new_game = Hangman(player, interaction.channel)
-    image, embed, view = new_game.start_game()
-    return await interaction.followup.send(file=image, embed=embed, view=view, ephemeral=True)
+    player = await Player.load(interaction)
+
+    for _ in range(2):  # look again if another command or process started a game for this player first
+        game = games.get(player.id)
+        if game is not None:
+            result = game.id, game.channel.id
+        else:  # not live in this process, fall back to the database
+            result = await query.execute("SELECT id, channel_id FROM games WHERE player_id = ? AND is_done = ?",
+                                         (player.id, 0), fetch=True)
+        if result:
+            game_id, active_channel_id = result
+            if active_channel_id == interaction.channel.id:
+                if game is None:
+                    game = await Hangman.load(player, interaction.channel, game_id)
+                else:
+                    game.resume(player, interaction.channel)
+                image, embed, view = await game.current_progress()
+                return await interaction.followup.send(file=image, embed=embed, view=view, ephemeral=True)
+            # the channel isn't cached when its guild is on a shard run by another process
+            game_channel = bot.get_channel(active_channel_id) or await bot.fetch_channel(active_channel_id)
+            game_server = game_channel.guild
+            content = f"You already have an active game in {game_server.name}'s {game_channel.jump_url}."
+            embed = discord.Embed(title=f"You can't play here, {player.user.mention}...",
+                                  description=content, color=discord.Color.red())
+            embed.set_thumbnail(url=bot.user.avatar.url)
+            return await interaction.followup.send(embed=embed, ephemeral=True)
+
+        try:
+            new_game = await Hangman.load(player, interaction.channel)
+        except sqlite3.IntegrityError:  # idx_games_one_active allows one unfinished game per player
+            continue
+        image, embed, view = new_game.start_game()
+        return await interaction.followup.send(file=image, embed=embed, view=view, ephemeral=True)
+
+    # another game of the player's was started and finished again between every look, so there's none to show
+    embed = discord.Embed(title=f"You already have a game in progress, {player.user.mention}...",
+                          description="Wait a moment, then use `/hangman` again to pick it up.",
+                          color=discord.Color.red())
+    return await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+class LeaderboardRow(NamedTuple):
+    place: int
+    discord_id: int
+    member: discord.Member
+    points: int
+    credits: int
+
+
+async def build_leaderboard(guild: discord.Guild, period: str,
+                            number_of_top_players: int) -> tuple[list[LeaderboardRow], str]:
+    """
+    Builds the parts of a leaderboard that are the same for every member of the guild. Results are cached in
+    `leaderboards` until a member finishes a game in any process of the cluster, which bumps the guild's version, the
+    guild's membership changes or the cache entry expires.
+
+    :param guild: The guild to build the leaderboard for
+    :param period: One of `options.LEADERBOARD_PERIODS`
+    :param number_of_top_players: The number of top players to include in the leaderboard
+    :return: The ranked players and the rendered table
+    """
+    key = (guild.id, period, number_of_top_players)
+    version = await query.guild_version(guild.id)  # read first, so a game finished while building isn't missed
+    cached = leaderboards.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    n_days = options.LEADERBOARD_PERIODS[period]
+
+    # Sums whole days from the player_daily_points rollup that `Hangman.win` and `Hangman.lose` maintain
+    query_ = """
+        SELECT p.discord_id, SUM(d.points) as total_points, p.credits
+        FROM guild_members m
+        JOIN players p ON p.id = m.user_id
+        LEFT JOIN player_daily_points d ON d.player_id = p.id
+        WHERE m.guild_id = ?
+    """
+    params = [guild.id]
+    if n_days > 0:
+        query_ += " AND d.day >= date('now', ?)"
+        params.append(f"-{n_days - 1} days")
+    query_ += " GROUP BY p.discord_id ORDER BY total_points DESC LIMIT ?"
+    params.append(number_of_top_players)
+
+    results = await query.execute(query_, tuple(params), fetch_one=False)
+    # players who haven't finished a game have no points to rank
+    rows = [LeaderboardRow(place, discord_id, guild.get_member(discord_id), points, credits)
+            for place, (discord_id, points, credits) in enumerate(
+                (result for result in results if result[1] is not None), start=1)]
+
+    with tracing.span("tabulate"):
+        from tabulate import tabulate
+
+        table = tabulate([[row.place, row.member.nick or row.member.name,
+                           format(row.points, f",.{'0' if int(row.points) == float(row.points) else '1'}f"),
+                           format(row.credits, ",d")] for row in rows],
+                         headers=["Place", "Player", "Points", "Credits"], tablefmt="simple_outline")
+
+    leaderboards.put(key, (version, rows, table))
+    return rows, table
 
 
 @bot.tree.command(name="leaderboard", description="A leaderboard for all Hangman players in your server!",
@@ -140,6 +301,8 @@ async def hangman(interaction: discord.Interaction):
                        period=f"[Default \"{options.DEFAULT_LEADERBOARD_PERIOD}\"] How far back the leaderboard "
                               "should be calculated")
 @app_commands.choices(period=[app_commands.Choice(name=k, value=k) for k in options.LEADERBOARD_PERIODS.keys()])
+@throttle.admitted("leaderboard")
+@metrics.timed(metrics.COMMAND_SECONDS, "leaderboard")
 async def leaderboard(interaction: discord.Interaction, number_of_top_players: int = options.DEFAULT_NUM_TOP_PLAYERS,
                       period: app_commands.Choice[str] = options.DEFAULT_LEADERBOARD_PERIOD):
     """
@@ -156,63 +319,31 @@ async def leaderboard(interaction: discord.Interaction, number_of_top_players: i
                                                        f"available for server text channels.", silent=True)
 
     period = str(period.name if type(period) is app_commands.Choice else period)
-    n_days = options.LEADERBOARD_PERIODS[period]
-
-    with query.get_db_connection() as conn:
-        query_ = """
-            SELECT p.discord_id, SUM(g.points) as total_points, p.credits
-            FROM players p
-            LEFT JOIN games g ON p.id = g.player_id
-            WHERE p.id IN (
-                SELECT user_id FROM guild_members WHERE guild_id = ?
-            )
-        """
-        params = [interaction.guild.id]
-        if n_days > 0:
-            query_ += " AND g.created_at >= datetime('now', ?)"
-            params.append(f"-{n_days} days")
-        query_ += " GROUP BY p.discord_id ORDER BY total_points DESC LIMIT ?"
-        params.append(number_of_top_players)
-
-        players_data = pd.read_sql(query_.strip(), con=conn, params=params)
+    rows, table = await build_leaderboard(interaction.guild, period, number_of_top_players)
 
-    if len(players_data) < options.MIN_LEADERBOARD_PLAYERS:
+    if len(rows) < options.MIN_LEADERBOARD_PLAYERS:
         e = discord.Embed(title="No leaderboard players yet...",
                           description="There are not enough players to create a leaderboard.\nTry `/hangman`!",
                           color=discord.Color.red())
         return await interaction.followup.send(embed=e)
 
-    players_data.index = pd.Index(name="Place", data=list(range(1, len(players_data) + 1)), dtype=int)
-    players_data = players_data.rename(columns={"total_points": "Points", "credits": "Credits"}).dropna()
-    members = [interaction.guild.get_member(id_) for id_ in players_data["discord_id"]]
-    players_data["Player"] = [member.nick or member.name for member in members]
-    players_data = players_data[["Player", "Points", "Credits", "discord_id"]]
-
-    try:
-        user_place = players_data[players_data["discord_id"] == interaction.user.id].index[0]
-        user_points = players_data.loc[user_place, "Points"]
-        placement = f"You are in **{options.make_ordinal(user_place)}**, {interaction.user.mention}!"
-        post_board = []
-        if user_place > 1:
-            behind_member, behind_points = players_data.loc[user_place - 1, ["discord_id", "Points"]]
-            post_board.append(f"You are {behind_points - user_points} points behind {members[user_place - 2].mention}!")
-        if user_place < players_data.index[-1]:
-            ahead_member, ahead_points = players_data.loc[2, ["discord_id", "Points"]]
-            post_board.append(f"You are {user_points - ahead_points} points ahead of {members[user_place].mention}!")
-    except IndexError:
+    user_row = next((row for row in rows if row.discord_id == interaction.user.id), None)
+    post_board = []
+    if user_row is not None:
+        placement = f"You are in **{options.make_ordinal(user_row.place)}**, {interaction.user.mention}!"
+        if user_row.place > 1:
+            behind = rows[user_row.place - 2]
+            post_board.append(f"You are {behind.points - user_row.points} points behind {behind.member.mention}!")
+        if user_row.place < len(rows):
+            ahead = rows[user_row.place]
+            post_board.append(f"You are {user_row.points - ahead.points} points ahead of {ahead.member.mention}!")
+    else:
         placement = f"You are not placed, {interaction.user.mention}."
-        post_board = []
-
-    players_data["Points"] = players_data["Points"].apply(
-        lambda points: format(points, f",.{'0' if int(points) == float(points) else '1'}f")
-    )
-    players_data["Credits"] = players_data["Credits"].apply(lambda points: format(points, ",d"))
-    table = tabulate(players_data.drop(columns=["discord_id"]), headers="keys", tablefmt="simple_outline",
-                     showindex=True)
+
     post_board = "\n".join(post_board) if len(post_board) > 0 else "You are the lone champion!"
     embed = discord.Embed(title=f"Top {number_of_top_players} Players {period}",
                           description=f"{placement}\n```\n{table}\n```\n{post_board}",
-                          color=discord.Color.green() if interaction.user in members else discord.Color.red(),
+                          color=discord.Color.green() if user_row is not None else discord.Color.red(),
                           timestamp=datetime.datetime.now(tz=options.TZ))
 
     return await interaction.followup.send(embed=embed, silent=True)
@@ -220,6 +351,8 @@ async def leaderboard(interaction: discord.Interaction, number_of_top_players: i
 
 @bot.tree.command(name="history", description="A general history of your Hangman games!")
 @app_commands.describe(num_games=f"[Default {options.NUM_GAMES_HISTORY}] The last number of games to show a history of")
+@throttle.admitted("history")
+@metrics.timed(metrics.COMMAND_SECONDS, "history")
 async def history(interaction: discord.Interaction, num_games: int = options.NUM_GAMES_HISTORY):
     """
     Shows your hangman game history! See your wins, losses, and points!
@@ -229,18 +362,21 @@ async def history(interaction: discord.Interaction, num_games: int = options.NUM
     :return: The game history as a table
     """
     await interaction.response.defer(ephemeral=True)
-    player = Player(interaction)
+    player = await Player.load(interaction)
 
-    df = player.last_n_games(num_games)
-    if len(df) == 0:
+    records = await player.last_n_games(num_games)
+    if len(records) == 0:
         return await interaction.followup.send(
             f"You haven't played a single game yet, {interaction.user.mention}. Try using "
             f"`/hangman` in one of your server's channels!", ephemeral=True)
 
-    table = tabulate(df, headers="keys", showindex=False, tablefmt="presto")
-    num_games = len(df)
-    wins = sum(val == "Win" for val in df.loc[:, "Result"])
-    total_points = df["Points"].sum()
+    with tracing.span("tabulate"):
+        from tabulate import tabulate
+
+        table = tabulate(records, headers=GameRecord._fields, showindex=False, tablefmt="presto")
+    num_games = len(records)
+    wins = sum(record.Result == "Win" for record in records)
+    total_points = sum(record.Points for record in records)
     total_points = format(total_points, f",.{'0' if int(total_points) == float(total_points) else '1'}f")
 
     embed = discord.Embed(title=f"Your last {num_games:,} Hangman games",
@@ -253,6 +389,8 @@ async def history(interaction: discord.Interaction, num_games: int = options.NUM
 
 
 @bot.tree.command(name="profile", description="See an overview of your Hangman profile!")
+@throttle.admitted("profile")
+@metrics.timed(metrics.COMMAND_SECONDS, "profile")
 async def profile(interaction: discord.Interaction):
     """
     See your summarized profile! See your wins, losses, overall record, points, and number of credits!
@@ -261,14 +399,16 @@ async def profile(interaction: discord.Interaction):
     :return: The user's summarized profile
     """
     await interaction.response.defer(ephemeral=True)
-    player = Player(interaction)
+    player = await Player.load(interaction)
     if player is None:
         return await interaction.followup.send(content=f"You are not an active Hangman player. You can become one by "
                                                        f"playing your first game with `/hangman`!", ephemeral=True)
 
+    stats = await player.stats()
     content = "\n".join([
-        f"Games played: {player.num_games()}",
-        f"Record: {'-'.join(map(str, player.record()))}",
+        f"Games played: {stats.games_played:,}",
+        f"Record: {stats.wins:,}-{stats.losses:,}",
+        f"Win streak: {stats.current_streak:,} (best {stats.best_streak:,})",
         f"Points: {player.points:,}",
         f"Credits: {player.credits:,} {options.CREDIT_EMOJI}"
     ])
@@ -279,6 +419,107 @@ async def profile(interaction: discord.Interaction):
     return await interaction.followup.send(embed=embed, ephemeral=True)
 
 
+@bot.tree.command(name="botstats", description="Latency, cache and game statistics for the bot owner")
+async def botstats(interaction: discord.Interaction):
+    """
+    Shows the bot owner a summary of this process's metrics, with every metric attached in the Prometheus format.
+
+    :param interaction: The user's interaction with the bot
+    :return: The summarized metrics
+    """
+    if not await bot.is_owner(interaction.user):
+        return await interaction.response.send_message("Only the bot owner can see the bot's statistics.",
+                                                       ephemeral=True)
+
+    def latency(histogram: metrics.Histogram, label: str) -> str:
+        p50, p99 = histogram.quantile(0.5, label), histogram.quantile(0.99, label)
+        return f"{label}: {histogram.count(label):,} calls, p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms"
+
+    commands_ = [latency(metrics.COMMAND_SECONDS, labels[0]) for labels in metrics.COMMAND_SECONDS.values]
+    components = [latency(metrics.COMPONENT_SECONDS, labels[0]) for labels in metrics.COMPONENT_SECONDS.values]
+    wordnik = [latency(metrics.WORDNIK_SECONDS, labels[0]) for labels in metrics.WORDNIK_SECONDS.values]
+    caches = [f"{name}: {cache.stats()['hit_rate']:.0%} hits, {cache.stats()['size']:,} entries"
+              for name, cache in (("Games", games), ("Players", players), ("Leaderboards", leaderboards))]
+    started = sum(metrics.GAMES_STARTED.values.values())
+    finished = ", ".join(f"{count:,} {result}" for (result,), count in metrics.GAMES_FINISHED.values.items())
+
+    embed = discord.Embed(title="Bot statistics", color=discord.Color.og_blurple(), timestamp=discord.utils.utcnow())
+    embed.add_field(name="Commands", value="\n".join(commands_) or "None yet", inline=False)
+    embed.add_field(name="Buttons and modals", value="\n".join(components) or "None yet", inline=False)
+    embed.add_field(name="Wordnik", value="\n".join(wordnik) or "No calls yet", inline=False)
+    embed.add_field(name="Caches", value="\n".join(caches), inline=False)
+    admission = throttle.admission.stats()
+    shed = ", ".join(f"{count:,} {handler} ({reason})"
+                     for (handler, reason), count in metrics.INTERACTIONS_SHED.values.items())
+    embed.add_field(name="Admission", value=f"{admission['running']}/{throttle.admission.max_concurrent} running, "
+                                            f"{admission['waiting']} waiting (most {admission['max_waiting']}), "
+                                            f"{admission['admitted']:,} admitted, {admission['shed']:,} shed"
+                                            + (f": {shed}" if shed else ""), inline=False)
+    embed.add_field(name="Games", value=f"{started:,} started" + (f", {finished}" if finished else ""), inline=False)
+    embed.add_field(name="Shards", value="\n".join(f"Shard {shard_id}: {guilds:,} servers, "
+                                                    f"{'-' if ms is None else f'{ms:.0f} ms'}"
+                                                    for shard_id, guilds, ms in shard_stats()) or "Not connected",
+                    inline=False)
+    report = discord.File(io.BytesIO(metrics.render().encode()), filename="metrics.txt")
+    return await interaction.response.send_message(embed=embed, file=report, ephemeral=True)
+
+
+@bot.tree.command(name="tracing", description="Set the fraction of interactions traced and see the slowest recent ones")
+@app_commands.describe(sample_rate="From 0 (off) to 1 (every interaction), unchanged if not given")
+async def trace_sampling(interaction: discord.Interaction, sample_rate: float | None = None):
+    """
+    Lets the bot owner change the tracing sample rate at runtime. Replies with the slowest recent traces, and every
+    recent trace as an attached file.
+
+    :param interaction: The user's interaction with the bot
+    :param sample_rate: The new fraction of interactions to trace
+    :return: The slowest recent traces
+    """
+    if not await bot.is_owner(interaction.user):
+        return await interaction.response.send_message("Only the bot owner can change tracing.", ephemeral=True)
+    if sample_rate is not None:
+        tracing.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    traces = list(tracing.recent)
+    slowest = sorted(traces, key=lambda span: span.seconds, reverse=True)[:3]
+    content = "\n".join(line for span in slowest for line in span.format())
+    embed = discord.Embed(title=f"Tracing {tracing.sample_rate:.1%} of interactions",
+                          description=f"```\n{content[:4000]}\n```" if content else "No traces yet.",
+                          color=discord.Color.og_blurple(), timestamp=discord.utils.utcnow())
+    files = []
+    if traces:
+        text = "\n\n".join("\n".join(span.format()) for span in traces)
+        files.append(discord.File(io.BytesIO(text.encode()), filename="traces.txt"))
+    return await interaction.response.send_message(embed=embed, files=files, ephemeral=True)
+
+
+@bot.tree.command(name="profiler", description="Start or stop the sampling profiler")
+@app_commands.choices(action=[app_commands.Choice(name=action, value=action) for action in ("start", "stop")])
+async def profiler(interaction: discord.Interaction, action: str):
+    """
+    Lets the bot owner sample the stacks of every thread in this process. Stopping it replies with the samples as
+    collapsed stacks, ready for flamegraph.pl or speedscope.
+
+    :param interaction: The user's interaction with the bot
+    :param action: "start" or "stop"
+    :return: The profile, when stopped
+    """
+    if not await bot.is_owner(interaction.user):
+        return await interaction.response.send_message("Only the bot owner can run the profiler.", ephemeral=True)
+    if action == "start":
+        started = tracing.start_profiler()
+        return await interaction.response.send_message("Profiler started." if started else "The profiler is already "
+                                                       "running.", ephemeral=True)
+
+    await interaction.response.defer(ephemeral=True)
+    samples = tracing.profiler.samples if tracing.profiler is not None else 0
+    path = await asyncio.to_thread(tracing.stop_profiler)
+    if path is None:
+        return await interaction.followup.send("The profiler isn't running.", ephemeral=True)
+    return await interaction.followup.send(f"Profiler stopped after {samples:,} samples, saved to `{path}`.",
+                                           file=discord.File(path), ephemeral=True)
+
+
 class Help(commands.MinimalHelpCommand):
     def __init__(self):
         super().__init__()
@@ -477,6 +718,29 @@ class Help(commands.MinimalHelpCommand):
         return signature
 
 
-if __name__ == "__main__":
+def run() -> None:
+    """
+    Runs the bot until it is stopped, on the shards given by the `SHARD_IDS` and `SHARD_COUNT` environment variables.
+    """
     bot.help_command = Help()
-    bot.run(os.environ["DISCORD_TOKEN"])
+
+    async def runner() -> None:
+        # Client.run only stops cleanly on Ctrl+C, so SIGTERM from docker, systemd or cluster.py closes the bot too
+        with contextlib.suppress(NotImplementedError):  # no signal handlers in Windows event loops
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        if IS_PRIMARY:  # nothing is served until the local database has caught up with the backup
+            await query.restore_at_startup()
+        async with bot:
+            await bot.start(os.environ["DISCORD_TOKEN"])
+
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(runner())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        query.close()  # commits the deferred writes
+
+
+if __name__ == "__main__":
+    run()
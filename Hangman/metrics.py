@@ -0,0 +1,189 @@
+import re
+import time
+import asyncio
+import options
+import tracing
+import functools
+
+# Every metric, in registration order, and the `stats()` sources exported as gauges, see `render`
+_metrics: list = []
+_stats: dict[str, object] = {}
+
+
+def _label_text(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labels, labels)} {value}" for labels, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = options.METRICS_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple, list] = {}  # labels -> [count per bucket, +Inf count, sum]
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * len(self.buckets), 0, 0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += 1
+        series[2] += value
+
+    def count(self, *labels) -> int:
+        series = self.values.get(labels)
+        return series[1] if series else 0
+
+    def quantile(self, q: float, *labels) -> float | None:
+        """
+        Estimates the `q` quantile of the observations with these labels by interpolating within its bucket.
+        """
+        series = self.values.get(labels)
+        if not series:
+            return None
+        rank, seen, lower = q * series[1], 0, 0.0
+        for bound, count in zip(self.buckets, series[0]):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]  # in the +Inf bucket, the largest finite bound is the best estimate
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, value_sum) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _label_text(self.labels + ("le",), labels + (repr(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), labels + ('+Inf',))} {total}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, labels)} {value_sum}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, labels)} {total}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def timed(histogram: Histogram, *labels):
+    """
+    Decorates a coroutine function to observe how long each call takes, and to trace a sample of the calls. The
+    wrapper keeps the signature and annotations of the function, so it can go under `app_commands` and `discord.ui`
+    decorators.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with histogram.time(*labels), tracing.trace(labels[0] if labels else func.__name__):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_stats(prefix: str, source) -> None:
+    """
+    Exports every number in `source()`, a `stats()` style dict, as the gauge `hangman_<prefix>_<key>`.
+    """
+    _stats[prefix] = source
+
+
+def _render_stats() -> list[str]:
+    lines = []
+    for prefix, source in _stats.items():
+        for key, value in source().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = re.sub(r"[^a-zA-Z0-9_]", "_", f"hangman_{prefix}_{key}")
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render() -> str:
+    """
+    :return: Every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    return "\n".join(lines + _render_stats()) + "\n"
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        method, path = request.split(b" ", 2)[:2]
+        if method == b"GET" and path.split(b"?")[0] in (b"/metrics", b"/"):
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not found\n"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.Server | None:
+    """
+    Serves `render()` over HTTP at http://host:port/metrics for Prometheus to scrape.
+    """
+    try:
+        return await asyncio.start_server(_handle, host, port)
+    except OSError as e:
+        print(f"Failed to start the metrics endpoint on {host}:{port}:", e, sep="\n")
+
+
+COMMAND_SECONDS = Histogram("hangman_command_seconds", "Time to handle a slash command", ("command",))
+COMPONENT_SECONDS = Histogram("hangman_component_seconds", "Time to handle a button press or modal submission",
+                              ("component",))
+QUERY_SECONDS = Histogram("hangman_query_seconds", "Time spent in query.execute, including waiting for a connection",
+                          ("statement",))
+WORDNIK_SECONDS = Histogram("hangman_wordnik_seconds", "Latency of Wordnik calls", ("call",))
+GAMES_STARTED = Counter("hangman_games_started_total", "Games started", ("kind",))
+GAMES_FINISHED = Counter("hangman_games_finished_total", "Games won, lost or quit", ("result",))
+ADMISSION_WAIT_SECONDS = Histogram("hangman_admission_wait_seconds",
+                                   "Time interactions waited for a slot when every slot was taken")
+INTERACTIONS_SHED = Counter("hangman_interactions_shed_total", "Interactions turned away by admission control",
+                            ("handler", "reason"))
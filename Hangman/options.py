@@ -1,4 +1,4 @@
-import pytz
+from zoneinfo import ZoneInfo
 
 
 PREFIX: str = "/"
@@ -20,7 +20,7 @@ POINTS: dict = {
     "LIVES": 50,
     "WOTD": 2
 }
-TZ: pytz.timezone = pytz.timezone("America/New_York")
+TZ: ZoneInfo = ZoneInfo("America/New_York")
 VOWELS: str = "AEIOU"
 CONSONANTS: str = "BCDFGHJKLMNPQRSTVWXYZ"
 MIN_LEADERBOARD_PLAYERS: int = 1
@@ -40,6 +40,62 @@ LIVES_LEFT = {5: (0, 255, 0),      # 00FF00
               3: (255, 255, 0),    # FFAE42
               2: (255, 174, 66),   # FFA500
               1: (255, 128, 0)}    # FF8000
+WORD_POOL_LOW: int = 10  # refill the random word pool when it drops below this many words
+WORD_POOL_HIGH: int = 50  # ...up to this many words
+WORD_POOL_RETRY_SECONDS: float = 30.0
+WORD_FETCH_TIMEOUT: float = 3.0  # seconds to wait on the provider for one word
+WORD_FETCH_THREADS: int = 4  # threads calling the provider, which may hang on it past the timeout
+FALLBACK_WORDS: tuple[str, ...] = ("ABRUPTLY", "BAGPIPES", "CROQUET", "DWARVES", "EQUIP", "FJORD", "GALAXY",
+                                   "HAIKU", "IVORY", "JUKEBOX", "KAYAK", "LENGTHS", "MYSTIFY", "NIGHTCLUB",
+                                   "OXYGEN", "PUZZLING", "QUIZZES", "RHYTHM", "SPHINX", "TRANSPLANT", "UNZIP",
+                                   "VODKA", "WIZARD", "XYLOPHONE", "YACHTSMAN", "ZEPHYR")
+GAME_REGISTRY_MAX_GAMES: int = 10_000  # live games kept in memory
+GAME_REGISTRY_TTL: float = 6 * 60 * 60  # seconds
+PLAYER_CACHE_SIZE: int = 50_000
+PLAYER_CACHE_TTL: float = 60.0  # seconds, bounds how stale credits and points cached by other processes get
+LEADERBOARD_CACHE_SIZE: int = 1_000
+LEADERBOARD_CACHE_TTL: float = 5 * 60  # seconds, in case an invalidation is missed
+DB_READER_THREADS: int = 4
+DB_GROUP_COMMIT_MAX: int = 64  # most writes committed in one transaction
+DB_BUSY_TIMEOUT: float = 5.0  # seconds
+DB_BEGIN_ATTEMPTS: int = 3  # times the writer waits out the busy timeout for the write lock before failing a batch
+WRITE_BEHIND_SECONDS: float = 2.0  # longest a deferred write waits before it is committed
+GUILD_SYNC_CHUNK_SIZE: int = 500  # guild members matched per statement when joining a guild
+BACKUP_BATCH_SIZE: int = 1_000  # change log entries copied to the backup per transaction
+RESTORE_CHUNK_SIZE: int = 1_000  # rows restored from the backup per transaction
+SNAPSHOT_INTERVAL_MINUTES: float = 60.0
+SNAPSHOT_PAGES_PER_STEP: int = 1_024  # database pages copied per step of a snapshot
+SNAPSHOT_KEEP_RECENT: int = 24  # newest snapshots always kept
+SNAPSHOT_KEEP_DAILY: int = 14  # days for which the last snapshot of the day is kept
+DB_STATEMENT_CACHE_SIZE: int = 256
+DB_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes
+DB_CACHE_SIZE_KIB: int = 64 * 1024
+
+# Cluster
+SHARD_STATS_SECONDS: float = 60.0  # how often each process reports its shards
+CLUSTER_RESTART_SECONDS: float = 5.0  # wait before restarting a worker process that crashed
+CLUSTER_STOP_SECONDS: float = 30.0  # time each worker gets to shut down cleanly before it is killed
+
+# Admission control, see throttle.py
+THROTTLE_USER_RATE: float = 2.0  # tokens a user's bucket gains per second
+THROTTLE_USER_BURST: float = 8.0  # most tokens a user's bucket holds
+THROTTLE_GUILD_RATE: float = 25.0
+THROTTLE_GUILD_BURST: float = 100.0
+THROTTLE_BUCKETS: int = 100_000  # most users, and most guilds, tracked at once
+THROTTLE_BUCKET_TTL: float = 60.0  # seconds an idle bucket is kept, longer than any bucket takes to refill
+ADMISSION_MAX_CONCURRENT: int = 32  # interactions handled at once
+ADMISSION_MAX_WAITING: int = 256  # interactions waiting for a slot before new ones are shed
+ADMISSION_WAIT_TIMEOUT: float = 2.0  # seconds an interaction waits for a slot, under Discord's 3 second deadline
+
+# Metrics
+METRICS_HOST: str = "127.0.0.1"
+METRICS_PORT: int | None = 9108  # each cluster process listens on this plus its cluster id, None disables the endpoint
+METRICS_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tracing
+TRACE_SAMPLE_RATE: float = 0.0  # fraction of interactions traced, off unless turned on
+TRACE_BUFFER_SIZE: int = 100  # finished traces kept in memory
+PROFILE_INTERVAL: float = 0.005  # seconds between stack samples while the profiler runs
 
 
 def make_ordinal(n: int) -> str:
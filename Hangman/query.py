@@ -1,27 +1,49 @@
 import os
+import gzip
+import time
+import queue
+import asyncio
+import metrics
 import options
+import tracing
+import shutil
 import sqlite3
-import pandas as pd
-import mysql.connector
+import datetime
+import itertools
+import threading
+from typing import TYPE_CHECKING
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
 
-# Path to the SQLite database file (stored in the same directory as the script)
+if TYPE_CHECKING:  # mysql.connector is only imported by the backup jobs, on first use
+    import mysql.connector
+
+# Path to the SQLite database file (stored in the same directory as the script, created on first connection)
 DB_PATH = os.path.join(os.path.dirname(__file__), "hangman.db")
-if not os.path.exists(DB_PATH):
-    with open(DB_PATH, "x"):  # create the new file
-        pass
+# Directory for the compressed point-in-time snapshots of the database, see `take_snapshot`
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshots")
 
 
-def get_db_connection() -> sqlite3.Connection | None:
+def get_db_connection(read_only: bool = False) -> sqlite3.Connection | None:
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(DB_PATH, timeout=options.DB_BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=options.DB_STATEMENT_CACHE_SIZE)
         conn.row_factory = sqlite3.Row  # Allows fetching rows as dictionaries
+        conn.execute("PRAGMA journal_mode = WAL")  # readers never wait on the writer
+        conn.execute("PRAGMA synchronous = NORMAL")  # WAL stays consistent, only the last commits may roll back
+        conn.execute(f"PRAGMA mmap_size = {options.DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = {-options.DB_CACHE_SIZE_KIB}")  # negative means KiB, not pages
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
         return conn
     except sqlite3.Error as e:
         print("Error connecting to SQLite:", e, sep="\n")
 
 
-async def get_backup_db_connection() -> (mysql.connector.pooling.PooledMySQLConnection |
-                                         mysql.connector.connection.MySQLConnectionAbstract | None):
+async def get_backup_db_connection() -> ("mysql.connector.pooling.PooledMySQLConnection | "
+                                         "mysql.connector.connection.MySQLConnectionAbstract | None"):
+    import mysql.connector
+
     try:
         print("Connecting to backup SQL server...")
         conn = mysql.connector.connect(
@@ -37,64 +59,566 @@ async def get_backup_db_connection() -> (mysql.connector.pooling.PooledMySQLConn
         print("Error connecting to backup MySQL server:", e, sep="\n")
 
 
-def execute(statement: str, params: tuple = (), commit: bool = False, fetch: bool = True, fetch_one: bool = True):
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(statement.strip(), params)
+class DBWriter(threading.Thread):
+    """
+    Owns the only write connection to the SQLite database.
+
+    Jobs are callables that receive the connection. Every job queued while the previous batch was committing is run in
+    a single transaction (group commit), each inside its own savepoint so one failing job doesn't undo the others.
+    Jobs must not call ``commit`` or ``rollback`` themselves.
+    """
+
+    def __init__(self):
+        super().__init__(name="hangman-db-writer", daemon=True)
+        self.jobs = queue.Queue()
+
+    def submit(self, job) -> Future:
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def stop(self) -> None:
+        self.jobs.put((None, None))
+        self.join()
+
+    def run(self):
+        conn = get_db_connection()
+        conn.isolation_level = None  # transactions are managed explicitly below
+        running = True
+        while running:
+            batch = [self.jobs.get()]
+            while len(batch) < options.DB_GROUP_COMMIT_MAX:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if any(job is None for job, _ in batch):
+                running = False
+                batch = [(job, future) for job, future in batch if job is not None]
+            if batch:
+                self._run_batch(conn, batch)
+        conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        # Whatever fails, every future gets a result or an exception and the thread keeps going, so no caller waits
+        # forever and later jobs still run
+        try:
+            results = self._commit_batch(conn, batch)
+        except Exception as e:  # the transaction couldn't be started or committed, so none of the batch was written
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            results = [(future, None, e) for _, future in batch]
+
+        for future, result, error in results:
+            try:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            except InvalidStateError:  # cancelled, nobody is waiting for it
+                pass
+
+    @staticmethod
+    def _begin(conn: sqlite3.Connection) -> None:
+        # Take the write lock up front so other processes' writers wait out the busy timeout instead of failing halfway
+        # through a batch. Each attempt waits up to `options.DB_BUSY_TIMEOUT` for another process to commit.
+        for attempt in range(1, options.DB_BEGIN_ATTEMPTS + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == options.DB_BEGIN_ATTEMPTS:
+                    raise
+                print(f"The database is locked by another process, retrying ({attempt}/{options.DB_BEGIN_ATTEMPTS})")
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> list:
+        results = []
+        self._begin(conn)
+        for job, future in batch:
+            conn.execute("SAVEPOINT job")
+            try:
+                results.append((future, job(conn), None))
+                conn.execute("RELEASE job")
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                results.append((future, None, e))
+        conn.execute("COMMIT")
+        return results
+
+
+_writer: DBWriter | None = None
+_writer_lock = threading.Lock()
+_readers = ThreadPoolExecutor(max_workers=options.DB_READER_THREADS, thread_name_prefix="hangman-db-reader")
+_reader_local = threading.local()
+_reader_connections: list[sqlite3.Connection] = []
+
+
+def get_writer() -> DBWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = DBWriter()
+            _writer.start()
+        return _writer
+
+
+def _read_job(job):
+    # each reader thread keeps its own read-only connection for the life of the process
+    conn = getattr(_reader_local, "conn", None)
+    if conn is None:
+        conn = _reader_local.conn = get_db_connection(read_only=True)
+        with _writer_lock:
+            _reader_connections.append(conn)
+    return job(conn)
+
+
+async def write(job):
+    """
+    Runs ``job(conn)`` on the writer thread and returns its result once the transaction containing it has committed.
+    """
+    return await asyncio.wrap_future(get_writer().submit(job))
+
+
+async def read(job):
+    """
+    Runs ``job(conn)`` on one of the reader threads and returns its result.
+    """
+    return await asyncio.wrap_future(_readers.submit(_read_job, job))
+
+
+async def execute(statement: str, params: tuple = (), commit: bool = False, fetch: bool = True,
+                  fetch_one: bool = True):
+    statement = statement.strip()
+    label = " ".join(statement.split())
+    with metrics.QUERY_SECONDS.time(label), tracing.span("sql", statement=label):
         if commit:
-            conn.commit()
-            return
-        if fetch:
-            return cursor.fetchone() if fetch_one else cursor.fetchall()
+            return await write(lambda conn: conn.execute(statement, params).lastrowid)
 
+        def job(conn: sqlite3.Connection):
+            cursor = conn.execute(statement, params)
+            if fetch:
+                return cursor.fetchone() if fetch_one else cursor.fetchall()
 
-async def initialize_db(include_backup: bool = True):
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        # Create players table
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS players (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                discord_id INTEGER UNIQUE,
+        return await read(job)
+
+
+# Write-behind: key -> (statement, params), committed together within `options.WRITE_BEHIND_SECONDS`
+_pending: dict = {}
+_flush_handle: asyncio.TimerHandle | None = None
+
+
+def defer(key, statement: str, params: tuple = ()) -> None:
+    """
+    Queues a write to be committed within `options.WRITE_BEHIND_SECONDS`. A later write with the same key replaces an
+    earlier one that hasn't been flushed yet, so `statement` must set absolute values rather than increment them.
+    """
+    _pending[key] = (statement.strip(), params)
+    _schedule_flush()
+
+
+def _schedule_flush() -> None:
+    global _flush_handle
+    if _flush_handle is None:
+        loop = asyncio.get_running_loop()
+        _flush_handle = loop.call_later(options.WRITE_BEHIND_SECONDS, lambda: loop.create_task(_flush_later()))
+
+
+def _take_pending() -> list:
+    global _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    pending = list(_pending.items())
+    _pending.clear()
+    return pending
+
+
+def _flush_job(pending: list, job=None):
+    def flush_job(conn: sqlite3.Connection):
+        for _, (statement, params) in pending:
+            conn.execute(statement, params)
+        return job(conn) if job is not None else None
+    return flush_job
+
+
+async def flush(job=None):
+    """
+    Commits every deferred write now, together with `job(conn)` if given, in a single transaction.
+
+    :return: The result of `job`
+    """
+    pending = _take_pending()
+    if not pending and job is None:
+        return None
+    try:
+        return await write(_flush_job(pending, job))
+    except Exception:
+        for key, value in pending:  # keep anything that hasn't been superseded for the next flush
+            _pending.setdefault(key, value)
+        if _pending:
+            _schedule_flush()
+        raise
+
+
+async def _flush_later() -> None:
+    try:
+        await flush()
+    except Exception as e:
+        print("Failed to flush deferred writes:", e, sep="\n")
+
+
+def close() -> None:
+    """
+    Commits any queued and deferred writes and stops the database threads.
+    """
+    global _writer
+    pending = _take_pending()
+    if pending:
+        get_writer().submit(_flush_job(pending))  # the writer drains its queue before stopping
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            _writer.stop()
+        _writer = None
+    _readers.shutdown(wait=True)
+    for conn in _reader_connections:
+        conn.close()
+    _reader_connections.clear()
+
+
+async def sync_guild_members(guild_id: int, discord_ids) -> int:
+    """
+    Adds every known player among `discord_ids` to the guild's members. The ids are matched against the players'
+    unique `discord_id` index in chunks of `options.GUILD_SYNC_CHUNK_SIZE`, each in its own write, so syncing a very
+    large guild never holds the writer or the event loop for long. Existing memberships are left alone.
+
+    :param guild_id: The guild's Discord id
+    :param discord_ids: An iterable of the guild members' Discord ids
+    :return: The number of memberships added
+    """
+    discord_ids = iter(discord_ids)
+    added = 0
+    while chunk := tuple(itertools.islice(discord_ids, options.GUILD_SYNC_CHUNK_SIZE)):
+        statement = ("INSERT OR IGNORE INTO guild_members (guild_id, user_id) "
+                     f"SELECT ?, id FROM players WHERE discord_id IN ({', '.join('?' * len(chunk))})")
+        added += await write(lambda conn, params=(guild_id, *chunk): conn.execute(statement, params).rowcount)
+    return added
+
+
+async def report_shards(stats: list[tuple[int, int, float | None]]) -> None:
+    """
+    Records the guild count and latency of this process's shards for the rest of the cluster.
+
+    :param stats: (shard id, number of guilds, latency in milliseconds) for each shard
+    """
+    def report(conn: sqlite3.Connection) -> None:
+        conn.executemany("INSERT OR REPLACE INTO shard_stats (shard_id, guilds, latency_ms, updated_at) "
+                         "VALUES (?, ?, ?, CURRENT_TIMESTAMP)", stats)
+
+    await write(report)
+
+
+async def count_guilds(shard_count: int) -> int:
+    """
+    :param shard_count: The number of shards in the cluster, rows of higher shards are left over from larger clusters
+    :return: The number of guilds across every shard of the cluster
+    """
+    result = await execute("SELECT COALESCE(SUM(guilds), 0) FROM shard_stats WHERE shard_id < ?", (shard_count,),
+                           fetch=True)
+    return result[0]
+
+
+def bump_guild_versions(conn: sqlite3.Connection, player_id: int) -> None:
+    """
+    Marks the leaderboards of every guild the player is in as stale, in every process. Run it in the transaction that
+    changes the player's points.
+    """
+    conn.execute("INSERT INTO guild_versions (guild_id, version) SELECT guild_id, 1 FROM guild_members "
+                 "WHERE user_id = ? ON CONFLICT (guild_id) DO UPDATE SET version = version + 1", (player_id,))
+
+
+async def guild_version(guild_id: int) -> int:
+    """
+    :return: The guild's version, see `bump_guild_versions`
+    """
+    result = await execute("SELECT version FROM guild_versions WHERE guild_id = ?", (guild_id,))
+    return result[0] if result else 0
+
+
+def _create_tables(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    # Create players table
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id INTEGER UNIQUE,
+            points INTEGER DEFAULT 0,
+            credits INTEGER DEFAULT {options.START_CREDITS}
+        )
+    """.strip())
+    # Create games table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER,
+            channel_id INTEGER,
+            word TEXT,
+            is_wotd INTEGER,
+            lives INTEGER,
+            progress TEXT,
+            guessed_letters TEXT,
+            guessed_words TEXT,
+            wrong_letters TEXT,
+            definitions TEXT,
+            points INTEGER DEFAULT 0,
+            is_done INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    """.strip())
+    # Create guild_members table (for leaderboard)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS guild_members (
+            guild_id INTEGER,
+            user_id INTEGER,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """.strip())
+
+
+# Schema changes applied on top of the base tables, in order. The SQLite schema version lives in `PRAGMA user_version`
+# and the backup's in its `schema_version` table, so each statement runs exactly once per database. Never edit or
+# reorder an entry that has shipped; append a new one instead.
+MIGRATIONS: list[dict[str, list[str]]] = [
+    # 1: indexes for the per-player game lookups and the leaderboard join
+    {
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS idx_games_player_done ON games (player_id, is_done, lives)",
+            "CREATE INDEX IF NOT EXISTS idx_games_player_created ON games (player_id, created_at, points)",
+            "CREATE INDEX IF NOT EXISTS idx_games_player_word ON games (player_id, word, is_wotd)",
+            # guild_id lookups are already served by the primary key, this covers the reverse direction
+            "CREATE INDEX IF NOT EXISTS idx_guild_members_user ON guild_members (user_id, guild_id)",
+        ],
+        "mysql": [
+            "CREATE INDEX idx_games_player_done ON games (player_id, is_done, lives)",
+            "CREATE INDEX idx_games_player_created ON games (player_id, created_at, points)",
+            "CREATE INDEX idx_games_player_word ON games (player_id, word(64), is_wotd)",
+            "CREATE INDEX idx_guild_members_user ON guild_members (user_id, guild_id)",
+        ],
+    },
+    # 2: per-player, per-day points rollup for the leaderboard, backfilled from finished games
+    {
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS player_daily_points (
+                player_id INTEGER,
+                day TEXT,
                 points INTEGER DEFAULT 0,
-                credits INTEGER DEFAULT {options.START_CREDITS}
-            )
-        """.strip())
-        # Create games table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS games (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                PRIMARY KEY (player_id, day)
+            ) WITHOUT ROWID
+            """.strip(),
+            "INSERT OR REPLACE INTO player_daily_points (player_id, day, points) "
+            "SELECT player_id, date(created_at), SUM(points) FROM games WHERE is_done = 1 "
+            "GROUP BY player_id, date(created_at)",
+        ],
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS player_daily_points (
                 player_id INTEGER,
-                channel_id INTEGER,
-                word TEXT,
-                is_wotd INTEGER,
-                lives INTEGER,
-                progress TEXT,
-                guessed_letters TEXT,
-                guessed_words TEXT,
-                wrong_letters TEXT,
-                definitions TEXT,
+                day DATE,
                 points INTEGER DEFAULT 0,
-                is_done INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (player_id) REFERENCES players(id)
+                PRIMARY KEY (player_id, day)
             )
-        """.strip())
-        # Create guild_members table (for leaderboard)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS guild_members (
-                guild_id INTEGER,
-                user_id INTEGER,
-                PRIMARY KEY (guild_id, user_id)
+            """.strip(),
+            "REPLACE INTO player_daily_points (player_id, day, points) "
+            "SELECT player_id, DATE(created_at), SUM(points) FROM games WHERE is_done = 1 "
+            "GROUP BY player_id, DATE(created_at)",
+        ],
+    },
+    # 3: change log for the incremental backup, seeded with every existing row so the first sync copies everything
+    {
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                key1 NOT NULL,
+                key2 NOT NULL DEFAULT '',
+                UNIQUE (tbl, key1, key2)
             )
-        """.strip())
-        conn.commit()
+            """.strip(),
+            "CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, seq INTEGER NOT NULL) WITHOUT ROWID",
+            "INSERT OR IGNORE INTO change_log (tbl, key1) SELECT 'players', id FROM players",
+            "INSERT OR IGNORE INTO change_log (tbl, key1) SELECT 'games', id FROM games",
+            "INSERT OR IGNORE INTO change_log (tbl, key1, key2) "
+            "SELECT 'guild_members', guild_id, user_id FROM guild_members",
+            "INSERT OR IGNORE INTO change_log (tbl, key1, key2) "
+            "SELECT 'player_daily_points', player_id, day FROM player_daily_points",
+        ],
+        "mysql": [],  # the change log only lives in the main database
+    },
+    # 4: one unfinished game per player, enforced across processes, and per-shard stats for the cluster. Only the
+    # newest unfinished game of a player is kept, older ones could never be resumed anyway and are quit the way
+    # `Hangman.quit_game` does it, rather than closed as wins with lives left.
+    {
+        "sqlite": [
+            "UPDATE players SET points = points - (SELECT COALESCE(SUM(points), 0) FROM games "
+            "WHERE games.player_id = players.id AND is_done = 0 "
+            "AND id NOT IN (SELECT MAX(id) FROM games WHERE is_done = 0 GROUP BY player_id)) "
+            "WHERE id IN (SELECT player_id FROM games WHERE is_done = 0 GROUP BY player_id HAVING COUNT(*) > 1)",
+            "DELETE FROM games WHERE is_done = 0 "
+            "AND id NOT IN (SELECT MAX(id) FROM games WHERE is_done = 0 GROUP BY player_id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_games_one_active ON games (player_id) WHERE is_done = 0",
+            """
+            CREATE TABLE IF NOT EXISTS shard_stats (
+                shard_id INTEGER PRIMARY KEY,
+                guilds INTEGER NOT NULL,
+                latency_ms REAL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """.strip(),
+        ],
+        "mysql": [],  # both are local to the processes sharing the main database
+    },
+    # 5: per-player totals and win streaks for /profile, kept up to date by `Hangman` and backfilled from finished
+    # games. A run of games starts at each loss, so a player's current streak is the wins in their last run.
+    {
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS player_stats (
+                player_id INTEGER PRIMARY KEY,
+                games_played INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                total_points INTEGER NOT NULL DEFAULT 0,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                best_streak INTEGER NOT NULL DEFAULT 0
+            )
+            """.strip(),
+            """
+            INSERT OR REPLACE INTO player_stats (player_id, games_played, wins, losses, total_points, current_streak,
+                                                 best_streak)
+            WITH finished AS (
+                SELECT player_id, points, lives > 0 AS won,
+                       SUM(lives = 0) OVER (PARTITION BY player_id ORDER BY id) AS run
+                FROM games WHERE is_done = 1
+            ), runs AS (
+                SELECT player_id, COUNT(*) AS games, SUM(won) AS wins, SUM(points) AS points,
+                       run = MAX(run) OVER (PARTITION BY player_id) AS is_last
+                FROM finished GROUP BY player_id, run
+            )
+            SELECT player_id, SUM(games), SUM(wins), SUM(games) - SUM(wins), SUM(points), SUM(wins * is_last),
+                   MAX(wins)
+            FROM runs GROUP BY player_id
+            """.strip(),
+            "INSERT OR IGNORE INTO change_log (tbl, key1) SELECT 'player_stats', player_id FROM player_stats",
+        ],
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS player_stats (
+                player_id INTEGER PRIMARY KEY,
+                games_played INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                total_points INTEGER NOT NULL DEFAULT 0,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                best_streak INTEGER NOT NULL DEFAULT 0
+            )
+            """.strip(),
+        ],
+    },
+    # 6: a version per guild, bumped whenever a member finishes a game, so every process of the cluster can tell that
+    # its cached leaderboard for the guild is stale
+    {
+        "sqlite": [
+            "CREATE TABLE IF NOT EXISTS guild_versions (guild_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)",
+        ],
+        "mysql": [],  # local to the processes sharing the main database
+    },
+    # 7: the change log position the backup has been synced up to, so a restore can tell whether the local database is
+    # behind the backup. SQLite stand-ins for the backup server already have the table from migration 3.
+    {
+        "sqlite": [],
+        "mysql": ["CREATE TABLE IF NOT EXISTS sync_state (name VARCHAR(32) PRIMARY KEY, seq BIGINT NOT NULL)"],
+    },
+]
+
+# Tables mirrored to the backup database and their primary key columns, parents before children
+SYNC_TABLES: dict[str, tuple[str, ...]] = {
+    "players": ("id",),
+    "games": ("id",),
+    "guild_members": ("guild_id", "user_id"),
+    "player_daily_points": ("player_id", "day"),
+    "player_stats": ("player_id",),
+}
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        for statement in migration["sqlite"]:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {version}")
+
+
+def _create_triggers(conn: sqlite3.Connection) -> None:
+    # Every write to a mirrored table records the row's key in `change_log`. A row changed again before the next sync
+    # replaces its old entry, so the log holds each changed row once, at the sequence number of its latest change. The
+    # old entry is deleted explicitly because the statement that fires a trigger overrides the conflict clause of the
+    # statements inside it, so `INSERT OR REPLACE` here would abort under an upsert.
+    for table, keys in SYNC_TABLES.items():
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            key2 = f"{row}.{keys[1]}" if len(keys) > 1 else "''"
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_{event.lower()}_log")
+            conn.execute(f"CREATE TRIGGER {table}_{event.lower()}_log AFTER {event} ON {table} BEGIN "
+                         f"DELETE FROM change_log WHERE tbl = '{table}' AND key1 = {row}.{keys[0]} AND key2 = {key2}; "
+                         f"INSERT INTO change_log (tbl, key1, key2) VALUES ('{table}', {row}.{keys[0]}, {key2}); END")
+
+
+def _backfill_daily_points(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM player_daily_points")
+    conn.execute(MIGRATIONS[1]["sqlite"][1])
+
+
+async def backfill_daily_points() -> None:
+    """
+    Rebuilds the `player_daily_points` leaderboard rollup from the finished games in the `games` table.
+    """
+    await flush(_backfill_daily_points)
+
+
+def _backfill_player_stats(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM player_stats")
+    conn.execute(MIGRATIONS[4]["sqlite"][1])
+
+
+async def backfill_player_stats() -> None:
+    """
+    Rebuilds `player_stats` from the finished games in the `games` table. Streaks broken by quitting can't be rebuilt,
+    quit games aren't kept.
+    """
+    await flush(_backfill_player_stats)
+
+
+def _initialize(conn: sqlite3.Connection) -> None:
+    _create_tables(conn)
+    _migrate(conn)
+    _create_triggers(conn)
+
+
+async def initialize_db(include_backup: bool = True):
+    await write(_initialize)
     if include_backup:
         await initialize_backup_db()
 
 
 async def initialize_backup_db():
     backup_conn = await get_backup_db_connection()
+    if backup_conn is None:
+        return
 
     with backup_conn as conn:
         cursor = conn.cursor()
@@ -135,48 +659,414 @@ async def initialize_backup_db():
                 PRIMARY KEY (guild_id, user_id)
             )
         """.strip())
+        # Apply outstanding migrations
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)")
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        version = cursor.fetchone()[0] or 0
+        for version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in migration["mysql"]:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
         conn.commit()
 
 
-async def main_to_backup_etl():
-    main_conn = get_db_connection()
-    backup_conn = await get_backup_db_connection()
+def _upsert_statement(table: str, columns: list[str], placeholder: str) -> str:
+    names = ", ".join(columns)
+    values = ", ".join([placeholder] * len(columns))
+    if placeholder == "?":  # SQLite stand-in for the backup server
+        return f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({values})"
+    # REPLACE would delete players that games still reference, so update the existing row in place instead
+    updates = ", ".join(f"{column} = VALUES({column})" for column in columns)
+    return f"INSERT INTO {table} ({names}) VALUES ({values}) ON DUPLICATE KEY UPDATE {updates}"
 
-    # Extract main
-    main_players = pd.read_sql_table("players", con=main_conn)
-    main_games = pd.read_sql_table("games", con=main_conn)
-    main_guild_members = pd.read_sql_table("guild_members", con=main_conn)
 
-    # Extract backup
-    backup_players = pd.read_sql("SELECT * FROM players", con=backup_conn)
-    backup_games = pd.read_sql("SELECT * FROM games", con=backup_conn)
-    backup_guild_members = pd.read_sql("SELECT * FROM guild_members", con=backup_conn)
+def _mark_synced(conn: sqlite3.Connection, seq: int) -> None:
+    conn.execute("INSERT OR REPLACE INTO sync_state (name, seq) VALUES ('backup', ?)", (seq,))
+    conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
 
-    # Transform (merge databases)
-    merge_players = pd.merge(main_players, backup_players, on="id", how="outer")
-    merge_games = pd.merge(main_games, backup_games, on="id", how="outer")
-    merge_guild_members = pd.merge(main_guild_members, backup_guild_members, on=main_guild_members.columns.names,
-                                   how="outer")
 
-    # Load
-    merge_players.to_sql("players", con=backup_conn, if_exists="replace", index=False)
-    merge_games.to_sql("games", con=backup_conn, if_exists="replace", index=False)
-    merge_guild_members.to_sql("guild_members", con=backup_conn, if_exists="replace", index=False)
+def _sync_backup(backup_conn) -> int:
+    # Runs on a worker thread. Each batch of the change log is committed to the backup before the high-water mark moves
+    # past it, so an interrupted sync resumes from the last committed batch and at worst copies a batch twice.
+    main_conn = get_db_connection(read_only=True)
+    placeholder = "?" if isinstance(backup_conn, sqlite3.Connection) else "%s"
+    cursor = backup_conn.cursor()
+    synced = 0
+    try:
+        row = main_conn.execute("SELECT seq FROM sync_state WHERE name = 'backup'").fetchone()
+        since = row[0] if row else 0
+        while changes := main_conn.execute("SELECT seq, tbl, key1, key2 FROM change_log WHERE seq > ? ORDER BY seq "
+                                           "LIMIT ?", (since, options.BACKUP_BATCH_SIZE)).fetchall():
+            changed = {table: set() for table in SYNC_TABLES}
+            for _, table, key1, key2 in changes:
+                changed[table].add((key1, key2)[:len(SYNC_TABLES[table])])
 
+            # a logged row that no longer exists was deleted, anything else is copied as it is now
+            deleted = {}
+            for table, keys in SYNC_TABLES.items():
+                if not changed[table]:
+                    continue
+                row_values = ", ".join([f"({', '.join('?' * len(keys))})"] * len(changed[table]))
+                rows = main_conn.execute(f"SELECT * FROM {table} WHERE ({', '.join(keys)}) IN (VALUES {row_values})",
+                                         [value for key in changed[table] for value in key]).fetchall()
+                if rows:
+                    cursor.executemany(_upsert_statement(table, rows[0].keys(), placeholder), [tuple(r) for r in rows])
+                deleted[table] = changed[table] - {tuple(r[key] for key in keys) for r in rows}
+            for table in reversed(deleted):
+                if deleted[table]:
+                    condition = " AND ".join(f"{key} = {placeholder}" for key in SYNC_TABLES[table])
+                    cursor.executemany(f"DELETE FROM {table} WHERE {condition}", list(deleted[table]))
+            since = changes[-1][0]
+            cursor.execute(_upsert_statement("sync_state", ["name", "seq"], placeholder), ("main", since))
+            backup_conn.commit()
+
+            get_writer().submit(lambda conn, seq=since: _mark_synced(conn, seq)).result()
+            synced += len(changes)
+    except Exception:
+        backup_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        main_conn.close()
+    return synced
+
+
+async def sync_backup(backup_conn=None) -> int:
+    """
+    Copies every row changed since the last sync to the backup database.
+
+    :param backup_conn: A DB-API connection to back up to, the MySQL backup server if not given. A `sqlite3` connection
+                        opened with ``check_same_thread=False`` and the same tables works as a local stand-in.
+    :return: The number of change log entries synced
+    """
+    await flush()  # deferred writes aren't in the change log until they are committed
+    close_conn = backup_conn is None
+    if close_conn:
+        backup_conn = await get_backup_db_connection()
+        if backup_conn is None:
+            return 0
+    try:
+        return await asyncio.to_thread(_sync_backup, backup_conn)
+    except Exception as e:
+        print("Failed to sync the backup database:", e, sep="\n")
+        return 0
+    finally:
+        if close_conn:
+            backup_conn.close()
+
+
+# Progress of the startup restore from the backup database, see `restore_from_backup`
+restore_progress = {"state": "idle", "table": None, "rows": 0, "total": 0, "seconds": 0.0}
+
+
+def _sqlite_value(value):
+    # MySQL returns DATE and TIMESTAMP columns as objects, SQLite stores them as text
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _change_log_seq(conn: sqlite3.Connection) -> int:
+    # the last sequence number handed out, which outlives the change log entries synced since
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _start_restore(conn: sqlite3.Connection, backup_seq: int, max_ids: dict[str, int]) -> list[str]:
+    # The tables an unfinished restore still has to copy are kept in `sync_state`, so a restore resumes where it
+    # stopped, in this process or another one. A new restore starts when the local database is empty or hasn't reached
+    # the change log position the backup was last synced to, e.g. after losing its latest writes. Row counts can't
+    # tell, a local database that deleted rows since the last sync has fewer of them but is ahead.
+    pending = [name.removeprefix("restore:") for name, in conn.execute("SELECT name FROM sync_state "
+                                                                       "WHERE name LIKE 'restore:%'")]
+    if not pending:
+        empty = not conn.execute("SELECT 1 FROM players LIMIT 1").fetchone()
+        if not (empty or _change_log_seq(conn) < backup_seq):
+            return []
+        pending = list(SYNC_TABLES)
+        conn.executemany("INSERT INTO sync_state (name, seq) VALUES (?, ?)",
+                         [(f"restore:{table}", backup_seq) for table in pending])
+    # Rows added while the restore runs, e.g. by a worker started by hand, are numbered past the backup's, so they
+    # can't take the id of a row still to be restored
+    for table, max_id in max_ids.items():
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, max_id))
+        elif row[0] < max_id:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (max_id, table))
+    return pending
 
-async def backup_to_main_etl():
-    main_conn = get_db_connection()
-    backup_conn = await get_backup_db_connection()
 
+def _finish_restore(conn: sqlite3.Connection, table: str, backup_seq: int) -> None:
+    conn.execute("DELETE FROM sync_state WHERE name = ?", (f"restore:{table}",))
+    if conn.execute("SELECT 1 FROM sync_state WHERE name LIKE 'restore:%'").fetchone():
+        return
+    # Later changes are numbered past the backup's position, so the next startup doesn't restore again, and every
+    # process rebuilds its leaderboards with the restored rows
+    if _change_log_seq(conn) < backup_seq:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'change_log'")
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (backup_seq,))
+    conn.execute("UPDATE guild_versions SET version = version + 1")
+
+
+def _restore_chunk(conn: sqlite3.Connection, table: str, columns: list[str], rows: list[tuple]) -> None:
+    # Rows already in the local database are at least as new as the backup's, so only missing rows are inserted, and
+    # not those with a change log entry either: they were deleted locally and the deletion hasn't been synced yet. The
+    # change log entries the inserts trigger are dropped, the backup already has these rows.
+    keys = [columns.index(key) for key in SYNC_TABLES[table]]
+    seq = _change_log_seq(conn)
+    conn.executemany(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) SELECT {', '.join('?' * len(columns))} "
+                     f"WHERE NOT EXISTS (SELECT 1 FROM change_log WHERE tbl = '{table}' AND key1 = ? AND key2 = ?)",
+                     [(*row, *[row[i] for i in keys], *[""] * (2 - len(keys)))
+                      for row in (tuple(map(_sqlite_value, row)) for row in rows)])
+    conn.execute("DELETE FROM change_log WHERE seq > ?", (seq,))
+
+
+def _backup_seq(conn) -> int:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT seq FROM sync_state WHERE name = 'main'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+
+
+def _max_ids(conn) -> dict[str, int]:
+    cursor = conn.cursor()
+    try:
+        max_ids = {}
+        for table in ("players", "games"):
+            cursor.execute(f"SELECT MAX(id) FROM {table}")
+            max_ids[table] = cursor.fetchone()[0] or 0
+        return max_ids
+    finally:
+        cursor.close()
+
+
+def _count_rows(conn) -> dict[str, int]:
+    cursor = conn.cursor()
     try:
-        # Extract backup
-        backup_players = pd.read_sql("SELECT * FROM players", con=backup_conn)
-        backup_games = pd.read_sql("SELECT * FROM games", con=backup_conn)
-        backup_guild_members = pd.read_sql("SELECT * FROM guild_members", con=backup_conn)
-
-        # Load to main tables
-        backup_players.to_sql("players", con=main_conn, if_exists="replace", index=False)
-        backup_games.to_sql("games", con=main_conn, if_exists="replace", index=False)
-        backup_guild_members.to_sql("guild_members", con=main_conn, if_exists="replace", index=False)
-    except pd.errors.DatabaseError as e:
-        print("Failed to backup server:", e, sep="\n")
+        counts = {}
+        for table in SYNC_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+        return counts
+    finally:
+        cursor.close()
+
+
+async def restore_from_backup(backup_conn=None) -> int:
+    """
+    Copies the rows the local database is missing from the backup database, when the local database is behind the
+    backup, see `_start_restore`. Rows deleted locally since the last sync stay deleted.
+
+    Each table is streamed in chunks of `options.RESTORE_CHUNK_SIZE` rows, each inserted in its own transaction through
+    the writer, so the writer is never held for long. The local tables, indexes and triggers are kept. Progress is
+    reported in `restore_progress`.
+
+    The bot restores before it serves anything, see `restore_at_startup`: a game finished while the restore runs would
+    create the player's ``player_stats`` and ``player_daily_points`` rows with only that game, and the backup's rows
+    would then be skipped.
+
+    :param backup_conn: A DB-API connection to restore from, the MySQL backup server if not given
+    :return: The number of rows restored
+    """
+    close_conn = backup_conn is None
+    if close_conn:
+        backup_conn = await get_backup_db_connection()
+        if backup_conn is None:
+            return 0
+    started = time.monotonic()
+    restore_progress.update(state="checking", table=None, rows=0, total=0, seconds=0.0)
+    cursor = backup_conn.cursor()
+    try:
+        await flush()
+        backup_seq = await asyncio.to_thread(_backup_seq, backup_conn)
+        remote = await asyncio.to_thread(_count_rows, backup_conn)
+        max_ids = await asyncio.to_thread(_max_ids, backup_conn)
+        pending = await write(lambda conn: _start_restore(conn, backup_seq, max_ids)) if any(remote.values()) else []
+        pending = [table for table in SYNC_TABLES if table in pending]  # parents first
+        if not pending:
+            restore_progress["state"] = "skipped"
+            return 0
+
+        restore_progress.update(state="restoring", total=sum(remote[table] for table in pending))
+        for table in pending:
+            restore_progress["table"] = table
+            await asyncio.to_thread(cursor.execute, f"SELECT * FROM {table}")
+            columns = [column[0] for column in cursor.description]
+            while rows := await asyncio.to_thread(cursor.fetchmany, options.RESTORE_CHUNK_SIZE):
+                await write(lambda conn, rows=rows: _restore_chunk(conn, table, columns, rows))
+                restore_progress["rows"] += len(rows)
+            await write(lambda conn: _finish_restore(conn, table, backup_seq))
+        restore_progress["state"] = "done"
+        return restore_progress["rows"]
+    except Exception as e:
+        restore_progress["state"] = "failed"
+        print("Failed to restore from the backup database:", e, sep="\n")
+        return restore_progress["rows"]
+    finally:
+        restore_progress["seconds"] = time.monotonic() - started
+        cursor.close()
+        if close_conn:
+            backup_conn.close()
+
+
+async def restore_at_startup() -> int:
+    """
+    Initializes the databases and restores the backup database, if the local database is behind it. Run it before the
+    bot serves anything, see `restore_from_backup`.
+
+    :return: The number of rows restored
+    """
+    await initialize_db(include_backup=False)
+    try:
+        await initialize_backup_db()
+    except Exception as e:  # the bot still starts without the backup server
+        print("Failed to initialize the backup database:", e, sep="\n")
+        return 0
+    return await restore_from_backup()
+
+
+def list_snapshots() -> list[str]:
+    """
+    :return: The paths of every snapshot, oldest first
+    """
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    names = sorted(name for name in os.listdir(SNAPSHOT_DIR) if name.startswith("hangman-") and name.endswith(".db.gz"))
+    return [os.path.join(SNAPSHOT_DIR, name) for name in names]
+
+
+def _take_snapshot() -> str:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    name = f"hangman-{datetime.datetime.now(datetime.timezone.utc):%Y%m%d-%H%M%S}.db"
+    path = os.path.join(SNAPSHOT_DIR, name)
+    source = get_db_connection(read_only=True)
+    target = sqlite3.connect(path + ".tmp")
+    try:
+        # Holding a read transaction pins the snapshot, so writes committed while the pages are copied neither block on
+        # the copy nor restart it. Under WAL the only cost is that checkpoints can't pass this reader until it's done.
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        source.backup(target, pages=options.SNAPSHOT_PAGES_PER_STEP)
+        source.execute("COMMIT")
+    finally:
+        source.close()
+        target.close()
+    with open(path + ".tmp", "rb") as raw, gzip.open(path + ".gz.tmp", "wb") as compressed:
+        shutil.copyfileobj(raw, compressed)
+    os.remove(path + ".tmp")
+    os.replace(path + ".gz.tmp", path + ".gz")
+    return path + ".gz"
+
+
+def _prune_snapshots() -> list[str]:
+    # Keep the newest snapshots, plus the newest snapshot of each of the most recent days
+    snapshots = list_snapshots()
+    keep = set(snapshots[-options.SNAPSHOT_KEEP_RECENT:])
+    daily = {}
+    for path in snapshots:
+        daily[os.path.basename(path)[len("hangman-"):][:8]] = path  # later snapshots of a day replace earlier ones
+    keep.update(daily[day] for day in sorted(daily)[-options.SNAPSHOT_KEEP_DAILY:])
+    removed = [path for path in snapshots if path not in keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+async def take_snapshot() -> str | None:
+    """
+    Writes a compressed, timestamped copy of the database to `SNAPSHOT_DIR` and removes the snapshots that fall
+    outside the retention rules in `options`.
+
+    :return: The path of the new snapshot, or None if it failed
+    """
+    await flush()
+    try:
+        path = await asyncio.to_thread(_take_snapshot)
+        await asyncio.to_thread(_prune_snapshots)
+        return path
+    except (OSError, sqlite3.Error) as e:
+        print("Failed to snapshot the database:", e, sep="\n")
+
+
+def restore_snapshot(path: str) -> None:
+    """
+    Replaces the contents of the database with a snapshot. Only run this while the bot is stopped.
+
+    :param path: The snapshot to restore
+    """
+    with gzip.open(path, "rb") as compressed, open(DB_PATH + ".restore", "wb") as raw:
+        shutil.copyfileobj(compressed, raw)
+    source = sqlite3.connect(DB_PATH + ".restore")
+    try:
+        if source.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+            raise sqlite3.DatabaseError(f"{path} failed its integrity check")
+        # copying through the backup API instead of over the file keeps the live WAL and shared memory files consistent
+        target = get_db_connection()
+        try:
+            source.backup(target, pages=options.SNAPSHOT_PAGES_PER_STEP)
+        finally:
+            target.close()
+    finally:
+        source.close()
+        os.remove(DB_PATH + ".restore")
+
+
+async def _main(command: str, backup_path: str | None = None) -> None:
+    if command == "restore-snapshot":
+        snapshots = list_snapshots()
+        if backup_path is None and not snapshots:
+            print("There are no snapshots to restore.")
+            return
+        restore_snapshot(backup_path or snapshots[-1])
+        print(f"Restored {backup_path or snapshots[-1]}.")
+        return
+
+    await initialize_db(include_backup=False)
+    if command == "backfill":
+        await backfill_daily_points()
+        await backfill_player_stats()
+        print("Rebuilt the leaderboard rollup and the player stats.")
+    elif command == "restore":
+        backup_conn = sqlite3.connect(backup_path, check_same_thread=False) if backup_path else None
+        print(f"Restored {await restore_from_backup(backup_conn):,} rows.")
+        if backup_conn is not None:
+            backup_conn.close()
+    elif command == "snapshot":
+        path = await take_snapshot()
+        if path:
+            print(f"Saved {path}.")
+    elif command == "backup":
+        backup_conn = None
+        if backup_path:
+            backup_conn = sqlite3.connect(backup_path, check_same_thread=False)
+            _create_tables(backup_conn)
+            _migrate(backup_conn)
+        print(f"Synced {await sync_backup(backup_conn):,} changed rows.")
+        if backup_conn is not None:
+            backup_conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hangman database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="rebuild the leaderboard rollup and player stats from the games table")
+    backup_parser = subparsers.add_parser("backup", help="copy rows changed since the last sync to the backup server")
+    backup_parser.add_argument("--sqlite", metavar="PATH", help="back up to a local SQLite file instead of MySQL")
+    restore_parser = subparsers.add_parser("restore", help="copy rows missing locally from the backup server")
+    restore_parser.add_argument("--sqlite", metavar="PATH", help="restore from a local SQLite file instead of MySQL")
+    subparsers.add_parser("snapshot", help="save a compressed snapshot of the database")
+    snapshot_parser = subparsers.add_parser("restore-snapshot", help="replace the database with a snapshot, only run "
+                                                                     "this while the bot is stopped")
+    snapshot_parser.add_argument("path", nargs="?", help="the snapshot to restore, the newest if not given")
+    args = parser.parse_args()
+
+    asyncio.run(_main(args.command, getattr(args, "sqlite", None) or getattr(args, "path", None)))
+    close()
@@ -0,0 +1,50 @@
+"""
+The /hangman command when it races other commands or processes starting a game for the same player. Run from the
+``Hangman`` directory with ``python -m unittest discover tests``.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+import query
+import hangman
+from benchmarks.fakes import FakeClient, FakeGuild, FakeChannel, FakeUser, FakeInteraction
+
+
+class HangmanCommandTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patches = [
+            mock.patch.object(query, "DB_PATH", os.path.join(self.directory.name, "hangman.db")),
+            mock.patch.object(main, "bot", FakeClient()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(lambda: query.get_writer().stop())  # the next test's writer opens its own database
+        self.addCleanup(hangman.players.clear)
+        await query.initialize_db(include_backup=False)
+
+        guild = FakeGuild()
+        self.user = FakeUser()
+        guild.members[self.user.id] = self.user
+        self.interaction = FakeInteraction(self.user, FakeChannel(guild), main.bot)
+
+    async def test_losing_every_race_still_answers(self):
+        # a game is started and finished again by another process between every look
+        conflict = sqlite3.IntegrityError("UNIQUE constraint failed: games.player_id")
+        with mock.patch.object(main.Hangman, "load", side_effect=conflict) as load:
+            await main.hangman.callback(self.interaction)
+
+        self.assertEqual(load.call_count, 2)
+        embed = self.interaction.last("embed")
+        self.assertIsNotNone(embed)
+        self.assertIn("already have a game in progress", embed.title)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+The cached player rows shared by a player's games and commands. Run from the ``Hangman`` directory with
+``python -m unittest discover tests``.
+"""
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import query
+import hangman
+from benchmarks.fakes import FakeUser
+
+
+class PlayerRowTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patch = mock.patch.object(query, "DB_PATH", os.path.join(self.directory.name, "hangman.db"))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(lambda: query.get_writer().stop())  # the next test's writer opens its own database
+        self.addCleanup(hangman.players.clear)
+        await query.initialize_db(include_backup=False)
+        self.interaction = SimpleNamespace(user=FakeUser())
+
+    async def test_a_game_and_a_reload_after_eviction_share_the_row(self):
+        in_game = await hangman.Player.load(self.interaction)
+        hangman.players.clear()  # evicted, or expired after `options.PLAYER_CACHE_TTL`
+        in_game.credits -= 100  # a purchase made by the game after the row left the cache
+
+        profile = await hangman.Player.load(self.interaction)
+        self.assertEqual(profile.credits, in_game.credits)
+        in_game.credits -= 100
+        self.assertEqual(profile.credits, in_game.credits)
+
+    async def test_a_reload_picks_up_changes_made_by_other_processes(self):
+        in_game = await hangman.Player.load(self.interaction)
+        hangman.players.clear()
+        await query.execute("UPDATE players SET credits = 123 WHERE id = ?", (in_game.id,), commit=True)
+
+        profile = await hangman.Player.load(self.interaction)
+        self.assertEqual(profile.credits, 123)
+        self.assertEqual(in_game.credits, 123)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Query plan regression check: ``EXPLAIN QUERY PLAN`` for the hot queries in ``hangman.py`` and ``main.py`` against a
+freshly migrated database, which must use the index each one is meant to and never scan a table. Run from the
+``Hangman`` directory with ``python -m unittest discover tests``.
+"""
+import query
+import sqlite3
+import unittest
+
+# name: (statement, params, index expected in the plan)
+HOT_QUERIES: dict[str, tuple[str, tuple, str]] = {
+    "has_active_game": ("SELECT COUNT(*) FROM games WHERE player_id = ? AND is_done = 0", (1,),
+                        "idx_games_player_done"),
+    "active_game": ("SELECT id, channel_id FROM games WHERE player_id = ? AND is_done = ?", (1, 0),
+                    "idx_games_player_done"),
+    "has_done_wotd": ("SELECT COUNT(*) FROM games WHERE player_id = ? AND word = ? AND is_wotd = 1", (1, "WORD"),
+                      "idx_games_player_word"),
+    "record": ("SELECT lives FROM games WHERE player_id = ? AND is_done = 1", (1,), "idx_games_player_done"),
+    "last_n_games": ("SELECT word, is_done, lives, points FROM games WHERE player_id = ? "
+                     "ORDER BY created_at DESC LIMIT ?", (1, 5), "idx_games_player_created"),
+    "num_games_since_days": ("SELECT COUNT(*) FROM games WHERE player_id = ? AND created_at >= datetime('now', ?)",
+                             (1, "-7 days"), "idx_games_player_created"),
+    "leaderboard": ("SELECT p.discord_id, SUM(d.points) as total_points, p.credits FROM guild_members m "
+                    "JOIN players p ON p.id = m.user_id "
+                    "LEFT JOIN player_daily_points d ON d.player_id = p.id "
+                    "WHERE m.guild_id = ? AND d.day >= date('now', ?) "
+                    "GROUP BY p.discord_id ORDER BY total_points DESC LIMIT ?", (1, "-6 days", 10),
+                    "SEARCH d USING PRIMARY KEY"),
+}
+
+
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.addCleanup(self.conn.close)
+        query._initialize(self.conn)
+
+    def test_hot_queries_use_their_indexes(self):
+        for name, (statement, params, index) in HOT_QUERIES.items():
+            with self.subTest(name):
+                plan = [row[-1] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {statement}", params)]
+                self.assertIn(index, "\n".join(plan))
+                # games and players are the big tables, but guild_members and the rollups would hurt as much
+                self.assertEqual([step for step in plan if step.startswith("SCAN")], [], "\n".join(plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Restoring from the backup database, with a local SQLite file standing in for the MySQL backup server. Run from the
+``Hangman`` directory with ``python -m unittest discover tests``.
+"""
+import os
+import sqlite3
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+import query
+
+PLAYERS = [(1, 1001, 150, 500), (2, 1002, 40, 500)]
+GAMES = [(1, 1, "APPLE", 3, 70, 1, "2026-01-01 10:00:00"), (2, 1, "BANANA", 2, 80, 1, "2026-01-01 11:00:00"),
+         (3, 2, "CHERRY", 0, 40, 1, "2026-01-01 12:00:00")]
+PLAYER_STATS = [(1, 2, 2, 0, 150, 2, 2), (2, 1, 0, 1, 40, 0, 0)]
+DAILY_POINTS = [(1, "2026-01-01", 150), (2, "2026-01-01", 40)]
+
+
+class RestoreTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patches = [
+            mock.patch.object(query, "DB_PATH", os.path.join(self.directory.name, "hangman.db")),
+            mock.patch.object(query.options, "RESTORE_CHUNK_SIZE", 1),  # a write per row, so games can interleave
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(lambda: query.get_writer().stop())  # the next test's writer opens its own database
+
+        self.backup = sqlite3.connect(os.path.join(self.directory.name, "backup.db"), check_same_thread=False)
+        self.addCleanup(self.backup.close)
+        query._create_tables(self.backup)
+        query._migrate(self.backup)
+        self.backup.executemany("INSERT INTO players (id, discord_id, points, credits) VALUES (?, ?, ?, ?)", PLAYERS)
+        self.backup.executemany("INSERT INTO games (id, player_id, word, lives, points, is_done, created_at) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)", GAMES)
+        self.backup.executemany("INSERT INTO player_stats VALUES (?, ?, ?, ?, ?, ?, ?)", PLAYER_STATS)
+        self.backup.executemany("INSERT INTO player_daily_points VALUES (?, ?, ?)", DAILY_POINTS)
+        self.backup.execute("INSERT INTO sync_state (name, seq) VALUES ('main', 20)")
+        self.backup.commit()
+        await query.initialize_db(include_backup=False)
+
+    def local(self, statement: str) -> list[tuple]:
+        conn = sqlite3.connect(query.DB_PATH)
+        try:
+            return conn.execute(statement).fetchall()
+        finally:
+            conn.close()
+
+    async def test_every_table_is_restored(self):
+        self.assertEqual(await query.restore_from_backup(self.backup), 9)
+        self.assertEqual(self.local("SELECT id, discord_id, points, credits FROM players ORDER BY id"), PLAYERS)
+        self.assertEqual(self.local("SELECT id, player_id FROM games ORDER BY id"), [(1, 1), (2, 1), (3, 2)])
+        self.assertEqual(self.local("SELECT * FROM player_stats ORDER BY player_id"), PLAYER_STATS)
+        self.assertEqual(self.local("SELECT * FROM player_daily_points ORDER BY player_id"), DAILY_POINTS)
+        self.assertEqual(self.local("SELECT * FROM change_log"), [])  # the backup already has these rows
+        self.assertEqual(await query.restore_from_backup(self.backup), 0)
+
+    async def test_game_started_during_the_restore_keeps_the_backups_games(self):
+        restore = asyncio.create_task(query.restore_from_backup(self.backup))
+        while query.restore_progress["table"] != "games":
+            await asyncio.sleep(0)
+        game_id = await query.execute("INSERT INTO games (player_id, word, lives) VALUES (2, 'DURIAN', 6)", commit=True)
+        await restore
+
+        self.assertGreater(game_id, max(game[0] for game in GAMES))
+        self.assertEqual(self.local("SELECT id, player_id, word FROM games ORDER BY id"),
+                         [(1, 1, "APPLE"), (2, 1, "BANANA"), (3, 2, "CHERRY"), (game_id, 2, "DURIAN")])
+        self.assertEqual(self.local("SELECT * FROM player_stats ORDER BY player_id"), PLAYER_STATS)
+
+    async def test_local_deletions_are_not_restored(self):
+        await query.restore_from_backup(self.backup)
+        await query.execute("DELETE FROM games WHERE id = 2", commit=True)  # quit, not synced to the backup yet
+        self.backup.execute("UPDATE sync_state SET seq = seq + 100")  # and the local database lost later writes
+        self.backup.commit()
+
+        await query.restore_from_backup(self.backup)
+        self.assertEqual(self.local("SELECT id FROM games ORDER BY id"), [(1,), (3,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Cold start budget, measured in fresh interpreters by `benchmarks.startup`. Run from the ``Hangman`` directory with
+``python -m unittest discover tests``.
+"""
+import os
+import tempfile
+import unittest
+
+from benchmarks import startup
+
+
+class StartupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp:
+            # the best of a few runs, so one slow start on a busy machine doesn't fail the suite
+            cls.runs = [startup.probe(os.path.join(tmp, f"hangman_{i}.db")) for i in range(3)]
+
+    def test_import_is_within_budget(self):
+        self.assertLess(min(run["import"] for run in self.runs), startup.IMPORT_BUDGET)
+
+    def test_database_is_ready_within_budget(self):
+        self.assertLess(min(run["ready"] for run in self.runs), startup.READY_BUDGET)
+
+    def test_heavy_dependencies_are_lazy(self):
+        self.assertEqual(sorted({name for run in self.runs for name in run["eager"]}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Word of the day caching against a local Wordnik stand-in. Run from the ``Hangman`` directory with
+``python -m unittest discover tests``.
+"""
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+import threading
+import concurrent.futures
+from unittest import mock
+
+import words
+from benchmarks.fakes import FakeWordnik
+
+
+class WordOfTheDayTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.provider = FakeWordnik(["APPLE"], wotd="rhythm")
+        patches = [
+            mock.patch.object(words, "WOTD_PATH", os.path.join(self.directory.name, "wotd.json")),
+            mock.patch.object(words, "provider", self.provider),
+            mock.patch.object(words, "today", return_value="2026-01-01"),
+            mock.patch.object(words, "_wotd", None),
+            mock.patch.object(words, "_wotd_lock", asyncio.Lock()),
+            mock.patch.object(words, "_wotd_retry_at", 0.0),
+            mock.patch.object(words, "_wotd_task", None),
+            mock.patch.object(words.options, "WORD_FETCH_TIMEOUT", 0.2),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    def set_today(self, date: str) -> None:
+        words.today.return_value = date
+
+    async def test_same_day_is_fetched_once(self):
+        await words.refresh_word_of_the_day()
+        await words.refresh_word_of_the_day()
+        self.assertEqual((await words.word_of_the_day())[0], "rhythm")
+        self.assertEqual(self.provider.wotd_calls, 1)
+
+    async def test_restart_reloads_the_persisted_word(self):
+        await words.refresh_word_of_the_day()
+        words._wotd = None  # a restarted process only has the file
+        self.provider.wotd = "other"
+        await words.refresh_word_of_the_day()
+        self.assertEqual((await words.word_of_the_day())[0], "rhythm")
+        self.assertEqual(self.provider.wotd_calls, 1)
+
+    async def test_rollover_refreshes_in_the_background(self):
+        await words.refresh_word_of_the_day()
+        self.set_today("2026-01-02")
+        self.provider.wotd = "cadence"
+        self.assertIsNone(await words.word_of_the_day())  # yesterday's word is never served
+        await words._wotd_task
+        self.assertEqual((await words.word_of_the_day())[0], "cadence")
+        self.assertEqual(self.provider.wotd_calls, 2)
+
+    async def test_provider_down_keeps_the_last_word_and_backs_off(self):
+        await words.refresh_word_of_the_day()
+        self.set_today("2026-01-02")
+        self.provider.down = True
+        wotd = await words.refresh_word_of_the_day()
+        self.assertEqual(wotd["word"], "rhythm")
+        self.assertIsNone(await words.word_of_the_day())
+        self.assertIsNone(words._wotd_task)  # no retry until the back-off is over
+        self.assertEqual(self.provider.wotd_calls, 2)
+
+        self.provider.down = False
+        words._wotd_retry_at = 0.0
+        await words.refresh_word_of_the_day()
+        self.assertEqual(self.provider.wotd_calls, 3)
+        self.assertIsNotNone(await words.word_of_the_day())
+
+    async def test_failing_to_save_keeps_the_word(self):
+        with mock.patch.object(words.os, "replace", side_effect=FileNotFoundError("wotd.json.tmp")):
+            wotd = await words.refresh_word_of_the_day()
+        self.assertEqual(wotd["word"], "rhythm")
+        self.assertEqual((await words.word_of_the_day())[0], "rhythm")
+        self.assertEqual(os.listdir(self.directory.name), [])  # no temporary file left behind
+
+    def test_concurrent_saves_never_collide(self):
+        wotd = {"date": "2026-01-01", "word": "rhythm", "definitions": []}
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            for future in [executor.submit(words._persist_wotd, wotd) for _ in range(200)]:
+                future.result()
+        self.assertEqual(words._load_persisted_wotd(), wotd)
+        self.assertEqual(os.listdir(self.directory.name), ["wotd.json"])
+
+    async def test_slow_provider_never_blocks_an_interaction(self):
+        self.provider.delay = 1.0
+        start = time.perf_counter()
+        lookups = await asyncio.gather(*(words.word_of_the_day() for _ in range(5)))
+        self.assertEqual(lookups, [None] * 5)
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+        self.assertIsNone(await words._wotd_task)  # gave up after WORD_FETCH_TIMEOUT
+        self.assertEqual(self.provider.wotd_calls, 1)
+        self.assertGreater(words._wotd_retry_at, time.monotonic())
+
+
+
+class WordPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.provider = FakeWordnik(["APPLE"])
+        self.pool = words.WordPool(low=0, high=0)  # no background refills, every get() goes to the provider
+        patches = [
+            mock.patch.object(words, "provider", self.provider),
+            mock.patch.object(words, "pool", self.pool),  # fetch_random_word records its metrics on the pool
+            mock.patch.object(words.options, "WORD_FETCH_TIMEOUT", 0.2),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_no_word_from_the_provider_falls_back(self):
+        self.provider.words = iter([None])
+        self.assertIn(await self.pool.get(), words.options.FALLBACK_WORDS)
+
+    async def test_known_down_provider_isnt_waited_on(self):
+        self.provider.delay = 0.5
+        self.assertIn(await self.pool.get(), words.options.FALLBACK_WORDS)  # gave up after WORD_FETCH_TIMEOUT
+
+        start = time.perf_counter()
+        self.assertIn(await self.pool.get(), words.options.FALLBACK_WORDS)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(self.pool.words_fetched, 0)
+
+    async def test_hung_calls_dont_hold_the_default_executor(self):
+        self.provider.delay = 0.5
+        with self.assertRaises(asyncio.TimeoutError):
+            await words.fetch_random_word()
+        self.provider.get_random_word = lambda: threading.current_thread().name
+        self.assertTrue((await words._call_provider("get_random_word")).startswith("hangman-wordnik"))
+
+
+if __name__ == "__main__":
+    unittest.main()
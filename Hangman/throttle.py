@@ -0,0 +1,156 @@
+import time
+import cache
+import asyncio
+import discord
+import metrics
+import options
+import functools
+
+
+class TokenBucket:
+    """
+    Holds up to `burst` tokens and gains `rate` tokens a second. A full bucket lets a burst through at once, after
+    which calls are held to the rate.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, cost: float = 1) -> bool:
+        """
+        :return: Whether there were `cost` tokens to take
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class Admission:
+    """
+    Decides which interactions are handled. Each one takes tokens from its user's and its guild's bucket and then
+    waits for one of `max_concurrent` slots. Interactions are shed when a bucket is empty, when `max_waiting` are
+    already waiting for a slot, or when no slot frees up within `wait_timeout` seconds, which keeps them inside
+    Discord's 3 second deadline for the first response. Only use it from the event loop.
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int, wait_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # Idle buckets are dropped once they would have refilled anyway
+        self._users = cache.LRUCache(options.THROTTLE_BUCKETS, options.THROTTLE_BUCKET_TTL)
+        self._guilds = cache.LRUCache(options.THROTTLE_BUCKETS, options.THROTTLE_BUCKET_TTL)
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def _take(self, buckets: cache.LRUCache, key: int, rate: float, burst: float, cost: float) -> bool:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+            buckets.put(key, bucket)
+        return bucket.take(cost)
+
+    def check(self, interaction: discord.Interaction, cost: float) -> str | None:
+        """
+        Takes the tokens for an interaction.
+
+        :return: Why the interaction should be shed, or None if it may wait for a slot
+        """
+        if not self._take(self._users, interaction.user.id, options.THROTTLE_USER_RATE, options.THROTTLE_USER_BURST,
+                          cost):
+            return "user"
+        if interaction.guild is not None and not self._take(self._guilds, interaction.guild.id,
+                                                            options.THROTTLE_GUILD_RATE,
+                                                            options.THROTTLE_GUILD_BURST, cost):
+            return "guild"
+        if self.waiting >= self.max_waiting:
+            return "queue_full"
+        return None
+
+    async def acquire(self) -> bool:
+        """
+        Waits for a slot, up to `wait_timeout` seconds.
+
+        :return: False if none freed up in time
+        """
+        if not self._slots.locked():
+            await self._slots.acquire()
+        else:
+            self.waiting += 1
+            self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+        self.running += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+        self._slots.release()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting_seen,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "user_buckets": len(self._users),
+            "guild_buckets": len(self._guilds),
+        }
+
+
+async def _shed(interaction: discord.Interaction, handler: str, reason: str) -> None:
+    admission.shed += 1
+    metrics.INTERACTIONS_SHED.inc(handler, reason)
+    if reason == "user":
+        content = "You're going too fast! Wait a moment and try again."
+    else:
+        content = "Hangman is very busy right now. Wait a moment and try again."
+    await interaction.response.send_message(content=content, delete_after=5, ephemeral=True)
+
+
+def admitted(handler: str, cost: float = 1):
+    """
+    Decorates an interaction handler (a slash command callback, a button callback or `Modal.on_submit`) to run it only
+    once `admission` lets it through, and to reply with a short ephemeral message instead when it is shed. `cost` is
+    the number of tokens the handler takes from the user's and the guild's buckets. Like `metrics.timed`, it keeps
+    the signature of the handler.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Views and modals pass themselves before the interaction
+            interaction = args[1] if isinstance(args[0], (discord.ui.View, discord.ui.Modal)) else args[0]
+            reason = admission.check(interaction, cost)
+            if reason is None and not await admission.acquire():
+                reason = "timeout"
+            if reason is not None:
+                return await _shed(interaction, handler, reason)
+            admission.admitted += 1
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                admission.release()
+        return wrapper
+    return decorator
+
+
+admission = Admission(options.ADMISSION_MAX_CONCURRENT, options.ADMISSION_MAX_WAITING, options.ADMISSION_WAIT_TIMEOUT)
@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import random
+import options
+import datetime
+import threading
+import contextlib
+from collections import deque, Counter
+from contextvars import ContextVar
+
+# Fraction of interactions traced; change it at runtime with `/tracing`
+sample_rate: float = options.TRACE_SAMPLE_RATE
+# The most recent finished traces, newest last
+recent: deque["Span"] = deque(maxlen=options.TRACE_BUFFER_SIZE)
+# Directory the sampling profiler writes its collapsed stacks to
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+
+_current: ContextVar["Span | None"] = ContextVar("hangman_span", default=None)
+_NOOP = contextlib.nullcontext()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: list[Span] = []
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def format(self, depth: int = 0) -> list[str]:
+        """
+        :return: This span and its children as an indented tree, one span per line
+        """
+        attrs = "".join(f" {key}={value!r}" for key, value in self.attrs.items())
+        lines = [f"{'  ' * depth}{self.name} {self.seconds * 1000:.1f} ms{attrs}"]
+        for child in self.children:
+            lines += child.format(depth + 1)
+        return lines
+
+
+class _SpanScope:
+    __slots__ = ("span", "parent", "token")
+
+    def __init__(self, name: str, attrs: dict, parent: Span | None):
+        self.span = Span(name, attrs)
+        self.parent = parent
+
+    def __enter__(self) -> Span:
+        if self.parent is not None:
+            self.parent.children.append(self.span)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.end = time.perf_counter()
+        _current.reset(self.token)
+        if exc_info[0] is not None:
+            self.span.attrs["error"] = exc_info[0].__name__
+        if self.parent is None:
+            recent.append(self.span)
+
+
+def trace(name: str, **attrs):
+    """
+    Starts a trace for one interaction, for `sample_rate` of the calls, or a span if a trace is already running.
+    Use it as a context manager.
+    """
+    if _current.get() is not None:
+        return span(name, **attrs)
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return _NOOP
+    return _SpanScope(name, attrs, None)
+
+
+def span(name: str, **attrs):
+    """
+    Records a span under the current one. Outside a sampled trace this does nothing, and costs one context lookup.
+    """
+    parent = _current.get()
+    if parent is None or parent.end is not None:  # tasks started by a traced call can outlive its trace
+        return _NOOP
+    return _SpanScope(name, attrs, parent)
+
+
+def http_trace_config():
+    """
+    :return: An `aiohttp.TraceConfig` that records every Discord HTTP request made inside a trace as a span
+    """
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.scope = span("discord.http", method=params.method, path=params.url.path)
+        context.scope.__enter__()
+
+    async def on_request_end(session, context, params):
+        context.scope.__exit__(None, None, None)
+
+    async def on_request_exception(session, context, params):
+        context.scope.__exit__(type(params.exception), params.exception, None)
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_request_exception.append(on_request_exception)
+    return config
+
+
+class Profiler(threading.Thread):
+    """
+    Samples the stack of every other thread each `interval` seconds and counts identical stacks. The result is in the
+    collapsed format of flamegraph.pl, speedscope and similar tools: one `frame;frame;frame count` line per stack, root
+    frame first. Coroutines show up under the event loop frames of the thread running them.
+    """
+
+    def __init__(self, interval: float = options.PROFILE_INTERVAL):
+        super().__init__(name="hangman-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stopped = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def stop(self) -> str:
+        """
+        Stops sampling and writes the collapsed stacks to `PROFILE_DIR`.
+
+        :return: The path of the profile
+        """
+        self._stopped.set()
+        self.join()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"profile-{datetime.datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, "w") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        return path
+
+
+profiler: Profiler | None = None
+
+
+def start_profiler(interval: float = options.PROFILE_INTERVAL) -> bool:
+    """
+    :return: False if the profiler was already running
+    """
+    global profiler
+    if profiler is not None:
+        return False
+    profiler = Profiler(interval)
+    profiler.start()
+    return True
+
+
+def stop_profiler() -> str | None:
+    """
+    :return: The path of the profile, or None if the profiler wasn't running
+    """
+    global profiler
+    if profiler is None:
+        return None
+    path, profiler = profiler.stop(), None
+    return path
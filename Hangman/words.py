@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import random
+import asyncio
+import metrics
+import options
+import tracing
+import datetime
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Today's word of the day is persisted here so a restart doesn't have to fetch it again
+WOTD_PATH = os.path.join(os.path.dirname(__file__), "wotd.json")
+
+# Anything with Wordnik's `word_of_the_day()` and `get_random_word()` methods; swap in a stand-in to run offline
+provider = None
+
+_wotd: dict | None = None  # {"date": ..., "word": ..., "definitions": [...]}
+_wotd_lock = asyncio.Lock()
+_wotd_retry_at = 0.0  # time.monotonic() before which a failed fetch isn't retried
+_wotd_task: asyncio.Task | None = None  # refresh started by `word_of_the_day`
+# Wordnik's client makes its HTTP requests without a timeout, so a hung request keeps its thread after the fetch gives
+# up. Provider calls get their own threads so hung ones can't starve the default executor the database jobs use.
+_provider_executor = ThreadPoolExecutor(max_workers=options.WORD_FETCH_THREADS, thread_name_prefix="hangman-wordnik")
+
+
+def get_provider():
+    global provider
+    if provider is None:
+        from random_word import Wordnik  # pulls in requests, so only load it once a word is needed
+        provider = Wordnik()
+    return provider
+
+
+async def _call_provider(method: str):
+    return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(_provider_executor,
+                                                                             getattr(get_provider(), method)),
+                                  timeout=options.WORD_FETCH_TIMEOUT)
+
+
+def today() -> str:
+    return datetime.datetime.now(tz=options.TZ).date().isoformat()
+
+
+def _load_persisted_wotd() -> dict | None:
+    try:
+        with open(WOTD_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _persist_wotd(wotd: dict) -> None:
+    # every cluster worker saves the word when the day changes, each through its own temporary file
+    fd, tmp_path = tempfile.mkstemp(prefix="wotd.", suffix=".tmp", dir=os.path.dirname(WOTD_PATH))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(wotd, f)
+        os.replace(tmp_path, WOTD_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+async def refresh_word_of_the_day(force: bool = False) -> dict | None:
+    """
+    Makes sure the cached word of the day belongs to today in `options.TZ`, fetching it from the provider at most once
+    per day. A fetch gives up after `options.WORD_FETCH_TIMEOUT` seconds. If the provider is slow or down, the last
+    known word is kept and the fetch isn't retried for `options.WORD_POOL_RETRY_SECONDS`.
+
+    :param force: Fetch from the provider even if today's word is already known
+    :return: The cached word of the day, or None if one has never been fetched
+    """
+    global _wotd, _wotd_retry_at
+    async with _wotd_lock:
+        date = today()
+        if not force and _wotd is not None and _wotd["date"] == date:
+            return _wotd
+        if not force:
+            persisted = await asyncio.to_thread(_load_persisted_wotd)
+            if persisted is not None and persisted.get("date") == date:
+                _wotd = persisted
+                return _wotd
+            if time.monotonic() < _wotd_retry_at:
+                return _wotd
+
+        try:
+            with metrics.WORDNIK_SECONDS.time("word_of_the_day"), tracing.span("wordnik.word_of_the_day"):
+                response = await _call_provider("word_of_the_day")
+            response = json.loads(response)
+        except Exception as e:
+            _wotd_retry_at = time.monotonic() + options.WORD_POOL_RETRY_SECONDS
+            print("Failed to fetch the word of the day:", repr(e), sep="\n")
+            return _wotd
+        _wotd = {"date": date, "word": response["word"], "definitions": response.get("definitions", [])}
+        try:
+            await asyncio.to_thread(_persist_wotd, _wotd)
+        except OSError as e:  # the word is still served from memory, only a restart has to fetch it again
+            print("Failed to save the word of the day:", e, sep="\n")
+        return _wotd
+
+
+async def word_of_the_day() -> tuple[str, list] | None:
+    """
+    Never waits on the provider. If the cached word is from an earlier day, a refresh is started in the background
+    and there is no word of the day until it succeeds; `main.refresh_wotd` normally fetches it right at midnight.
+
+    :return: Today's word and its definitions, or None if it isn't available
+    """
+    global _wotd_task
+    if _wotd is None or _wotd["date"] != today():
+        if (_wotd_task is None or _wotd_task.done()) and time.monotonic() >= _wotd_retry_at:
+            _wotd_task = asyncio.get_running_loop().create_task(refresh_word_of_the_day())
+        return None
+    return _wotd["word"], _wotd["definitions"]
+
+
+class WordPool:
+    """
+    Random words fetched ahead of time so starting a game never waits on the provider.
+
+    Taking a word is O(1). Whenever the pool drops below `low` words, a background task tops it back up to `high`.
+    """
+
+    def __init__(self, low: int = options.WORD_POOL_LOW, high: int = options.WORD_POOL_HIGH):
+        self.low = low
+        self.high = high
+        self.words: deque[str] = deque()
+        self._refill_task: asyncio.Task | None = None
+        self._retry_at = 0.0  # time.monotonic() before which the provider is taken to be down
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.refill_failures = 0
+        self.words_fetched = 0
+        self.fetch_seconds = 0.0
+        self.last_fetch_seconds = 0.0
+
+    def start(self) -> None:
+        if len(self.words) < self.low:
+            self._schedule_refill()
+
+    def take(self) -> str | None:
+        """
+        :return: A prefetched word, or None if the pool is empty
+        """
+        word = self.words.popleft() if self.words else None
+        if word is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if len(self.words) < self.low:
+            self._schedule_refill()
+        return word
+
+    def _schedule_refill(self) -> None:
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def _refill(self) -> None:
+        while len(self.words) < self.high:
+            try:
+                word = await fetch_random_word()
+            except Exception as e:
+                self.refill_failures += 1
+                self._retry_at = time.monotonic() + options.WORD_POOL_RETRY_SECONDS
+                print("Failed to refill the word pool:", repr(e), sep="\n")
+                await asyncio.sleep(options.WORD_POOL_RETRY_SECONDS)
+                continue
+            self.words.append(word)
+
+    async def get(self) -> str:
+        """
+        Takes a word from the pool, falling back to fetching one directly and then to `options.FALLBACK_WORDS` if the
+        pool is empty. While the provider is known to be down, the fallback words are used right away.
+        """
+        word = self.take()
+        if word is not None:
+            return word
+        if time.monotonic() < self._retry_at:
+            return random.choice(options.FALLBACK_WORDS)
+        try:
+            return await fetch_random_word()
+        except Exception as e:
+            self._retry_at = time.monotonic() + options.WORD_POOL_RETRY_SECONDS
+            print("Failed to fetch a random word:", repr(e), sep="\n")
+            return random.choice(options.FALLBACK_WORDS)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "depth": len(self.words),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refill_failures": self.refill_failures,
+            "words_fetched": self.words_fetched,
+            "last_fetch_seconds": self.last_fetch_seconds,
+            "mean_fetch_seconds": self.fetch_seconds / self.words_fetched if self.words_fetched else 0.0,
+        }
+
+
+async def fetch_random_word() -> str:
+    """
+    Fetches a word from the provider, giving up after `options.WORD_FETCH_TIMEOUT` seconds.
+
+    :raises ValueError: If the provider returned no word
+    """
+    start = time.perf_counter()
+    with tracing.span("wordnik.random_word"):
+        word = await _call_provider("get_random_word")
+    if not word:  # Wordnik's client returns None instead of raising for some failed requests
+        raise ValueError(f"The provider returned {word!r} instead of a word")
+    elapsed = time.perf_counter() - start
+    metrics.WORDNIK_SECONDS.observe(elapsed, "random_word")
+    pool.words_fetched += 1
+    pool.fetch_seconds += elapsed
+    pool.last_fetch_seconds = elapsed
+    return word
+
+
+pool = WordPool()